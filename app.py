@@ -1,6 +1,7 @@
 import os
 import threading
 import logging
+import logging.handlers
 import time
 import queue
 import sys
@@ -14,19 +15,27 @@ load_dotenv()
 # 根据环境变量确定是否为生产环境
 is_production = os.environ.get('RAILWAY_ENVIRONMENT') or os.environ.get('PRODUCTION')
 
-# 日志配置
+# 日志配置：LOG_LEVEL 可覆盖默认级别（生产 INFO，开发 DEBUG）
+log_level = os.environ.get('LOG_LEVEL', '').upper() or ('INFO' if is_production else 'DEBUG')
+# 处理函数只把日志记录放入队列，由后台 QueueListener 线程负责格式化和写 stdout
+log_stream_handler = logging.StreamHandler(sys.stdout)
+log_stream_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+log_queue = queue.Queue()
+log_listener = logging.handlers.QueueListener(log_queue, log_stream_handler)
+log_listener.start()
+atexit.register(log_listener.stop)
+log_queue_handler = logging.handlers.QueueHandler(log_queue)
+# 入队前只合并消息与异常文本，完整格式由监听线程上的 StreamHandler 负责
+log_queue_handler.setFormatter(logging.Formatter('%(message)s'))
 logging.basicConfig(
-    level=logging.INFO if is_production else logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout)
-    ]
+    level=getattr(logging, log_level, logging.INFO),
+    handlers=[log_queue_handler]
 )
 logger = logging.getLogger(__name__)
 
 # 导入自定义模块
 from modules.database import init_db, execute_query
-from modules.telegram_bot import run_bot, process_telegram_update
+from modules.telegram_bot import run_bot, stop_bot, process_telegram_update
 from modules.web_routes import register_routes
 from modules.constants import sync_env_sellers_to_db
 
@@ -36,6 +45,10 @@ notification_queue = queue.Queue()
 # 锁目录路径
 lock_dir = 'bot.lock'
 
+# 机器人线程；退出时等待它完成 stop()/shutdown() 后再结束进程
+bot_thread = None
+BOT_SHUTDOWN_TIMEOUT = 10
+
 # 清理锁目录的函数
 def cleanup_resources():
     """清理应用锁目录。"""
@@ -54,6 +67,12 @@ def cleanup_resources():
 # 信号处理函数
 def signal_handler(sig, frame):
     logger.info(f"收到信号 {sig}，正在清理资源...")
+    stop_bot()
+    # 机器人是守护线程，不等待的话进程会在 bot_main 的 finally 执行前退出
+    if bot_thread is not None and bot_thread.is_alive():
+        bot_thread.join(timeout=BOT_SHUTDOWN_TIMEOUT)
+        if bot_thread.is_alive():
+            logger.warning(f"Telegram机器人未在 {BOT_SHUTDOWN_TIMEOUT} 秒内关闭，强制退出")
     cleanup_resources()
     sys.exit(0)
 
@@ -100,12 +119,8 @@ def telegram_webhook():
         update_id = update_data.get('update_id') if isinstance(update_data, dict) else None
         logger.info(f"收到Telegram webhook更新: update_id={update_id}")
         
-        # 在单独的线程中处理更新，避免阻塞Flask响应
-        threading.Thread(
-            target=process_telegram_update,
-            args=(update_data, notification_queue),
-            daemon=True
-        ).start()
+        # 只投递到机器人事件循环，不等待处理结果，无需为每个更新单独起线程
+        process_telegram_update(update_data, notification_queue)
         
         # 立即返回响应，避免Telegram超时
         return jsonify({"status": "success"}), 200
@@ -0,0 +1,113 @@
+import functools
+from collections import OrderedDict
+import threading
+import time
+
+
+def ttl_cache(seconds, maxsize=256):
+    """带过期时间的进程内缓存装饰器；被装饰函数提供 cache_clear() 以便写操作后失效。"""
+    def decorator(func):
+        cache = {}
+        lock = threading.Lock()
+
+        @functools.wraps(func)
+        def wrapper(*args):
+            now = time.monotonic()
+            with lock:
+                hit = cache.get(args)
+                if hit and hit[1] > now:
+                    return hit[0]
+
+            value = func(*args)
+            with lock:
+                if len(cache) >= maxsize:
+                    # 先清掉过期项；仍然满时整体清空，保证内存有界
+                    for key in [k for k, (_, expires) in cache.items() if expires <= now]:
+                        del cache[key]
+                    if len(cache) >= maxsize:
+                        cache.clear()
+                cache[args] = (value, now + seconds)
+            return value
+
+        def cache_clear():
+            with lock:
+                cache.clear()
+
+        wrapper.cache_clear = cache_clear
+        return wrapper
+    return decorator
+
+
+_MISSING = object()
+
+
+class TTLDict:
+    """带过期时间和容量上限的字典；过期项在访问和写入时顺带淘汰，无需后台清理任务。"""
+
+    def __init__(self, ttl, maxsize=10000):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _purge(self, now):
+        # 按写入顺序排列，只需从最早的一端弹出过期项
+        while self._data:
+            key, (_, expires) = next(iter(self._data.items()))
+            if expires > now:
+                break
+            self._data.popitem(last=False)
+
+    def __setitem__(self, key, value):
+        now = time.monotonic()
+        with self._lock:
+            self._purge(now)
+            self._data.pop(key, None)
+            self._data[key] = (value, now + self.ttl)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get(self, key, default=None):
+        with self._lock:
+            hit = self._data.get(key)
+            if hit and hit[1] > time.monotonic():
+                return hit[0]
+            return default
+
+    def pop(self, key, default=None):
+        with self._lock:
+            hit = self._data.pop(key, None)
+            if hit and hit[1] > time.monotonic():
+                return hit[0]
+            return default
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        with self._lock:
+            self._purge(time.monotonic())
+            return len(self._data)
+
+
+class LRUDict(OrderedDict):
+    """容量有上限的字典；按下标读取或写入会刷新使用顺序，超出 maxsize 时淘汰最久未使用的项。"""
+
+    def __init__(self, maxsize=10000):
+        super().__init__()
+        self.maxsize = maxsize
+
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+        self.move_to_end(key)
+        return value
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+        if len(self) > self.maxsize:
+            self.popitem(last=False)
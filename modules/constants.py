@@ -4,6 +4,8 @@ import threading
 import logging
 import time
 
+from modules.cache_utils import LRUDict
+
 # 设置日志
 logger = logging.getLogger(__name__)
 
@@ -29,6 +31,14 @@ if os.environ.get('SELLER_CHAT_IDS'):
     except Exception as e:
         logger.error(f"解析SELLER_CHAT_IDS环境变量出错: {e}")
 
+# 超级管理员的 Telegram ID：可查看全体卖家统计，并接收订单状态变更、充值审核通知
+SUPER_ADMIN_ID = 1878943383
+if os.environ.get('SUPER_ADMIN_ID'):
+    try:
+        SUPER_ADMIN_ID = int(os.environ['SUPER_ADMIN_ID'].strip())
+    except ValueError:
+        logger.error(f"解析SUPER_ADMIN_ID环境变量出错，使用默认值: {SUPER_ADMIN_ID}")
+
 # 将环境变量中的卖家ID同步到数据库
 def sync_env_sellers_to_db():
     """将环境变量中的卖家ID同步到数据库"""
@@ -36,22 +46,21 @@ def sync_env_sellers_to_db():
         return
     
     # 导入放在函数内部，避免循环导入
-    from modules.database import execute_query
+    from modules.database import execute_query, invalidate_seller_caches
     
-    # 获取数据库中已存在的卖家ID
+    # 一条语句批量插入尚不存在的卖家，已存在的由主键冲突跳过
     try:
-        db_seller_ids = execute_query("SELECT telegram_id FROM sellers", fetch=True)
-        db_seller_ids = [row[0] for row in db_seller_ids] if db_seller_ids else []
-        
-        # 将环境变量中的卖家ID添加到数据库
         timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
-        for seller_id in SELLER_CHAT_IDS:
-            if seller_id not in db_seller_ids:
-                logger.info(f"将环境变量中的卖家ID {seller_id} 同步到数据库")
-                execute_query(
-                    "INSERT INTO sellers (telegram_id, username, first_name, is_active, added_at, added_by) VALUES (%s, %s, %s, %s, %s, %s)",
-                    (seller_id, f"env_seller_{seller_id}", f"环境变量卖家 {seller_id}", 1, timestamp, "环境变量")
-                )
+        inserted = execute_query("""
+            INSERT INTO sellers (telegram_id, username, first_name, is_active, added_at, added_by)
+            SELECT seller_id, 'env_seller_' || seller_id, '环境变量卖家 ' || seller_id, TRUE, %s, '环境变量'
+            FROM unnest(%s::bigint[]) AS seller_id
+            ON CONFLICT (telegram_id) DO NOTHING
+            RETURNING telegram_id
+        """, (timestamp, SELLER_CHAT_IDS), fetch=True) or []
+        for (seller_id,) in inserted:
+            logger.info(f"将环境变量中的卖家ID {seller_id} 同步到数据库")
+        invalidate_seller_caches()
     except Exception as e:
         logger.error(f"同步环境变量卖家到数据库失败: {e}")
 
@@ -124,5 +133,5 @@ DATABASE_URL = os.environ.get('DATABASE_URL', '').strip()
 if not DATABASE_URL.startswith(('postgres://', 'postgresql://')):
     logger.warning("未配置 PostgreSQL DATABASE_URL；应用启动时会拒绝使用 SQLite/空数据库。")
 
-# 用户信息缓存
-user_info_cache = {} 
\ No newline at end of file
+# 用户信息缓存：按最近使用淘汰，进程长时间运行时内存有上限
+user_info_cache = LRUDict(maxsize=10000) 
\ No newline at end of file
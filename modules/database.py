@@ -1,6 +1,8 @@
 from modules.db_core import (
+    db_connection,
     ensure_postgres_configured,
     execute_postgres_query,
+    execute_prepared,
     execute_query,
     get_postgres_connection,
 )
@@ -48,9 +50,11 @@ from modules.custom_prices import (
 )
 from modules.sellers import (
     add_seller,
+    get_active_seller_id_set,
     get_active_seller_ids,
     get_all_sellers,
     hash_password,
+    invalidate_seller_caches,
     is_admin_seller,
     remove_seller,
     toggle_seller_admin,
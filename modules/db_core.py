@@ -1,11 +1,51 @@
 import logging
+import os
+import threading
+from contextlib import contextmanager
 
 import psycopg2
+import psycopg2.extensions
+import psycopg2.pool
 
 from modules.constants import DATABASE_URL
 
 logger = logging.getLogger(__name__)
 
+# 连接池大小：空闲时最多保留 DB_POOL_MIN 个连接，同时借出最多 DB_POOL_MAX 个
+DB_POOL_MIN = int(os.environ.get('DB_POOL_MIN', '2'))
+DB_POOL_MAX = int(os.environ.get('DB_POOL_MAX', '20'))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+class PooledConnection(psycopg2.extensions.connection):
+    """来自连接池的连接：close() 时归还连接池而不是真正断开。"""
+
+    _returning = False
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # 本连接上已 PREPARE 的语句名；预备语句属于会话级，随连接复用
+        self.prepared_statements = set()
+
+    def close(self):
+        pool = _pool
+        if pool is None or self._returning:
+            return super().close()
+
+        self._returning = True
+        try:
+            if not self.closed and self.autocommit:
+                # 有些调用方（如建表）会打开 autocommit，归还前恢复默认事务模式
+                self.autocommit = False
+            pool.putconn(self)
+        except psycopg2.pool.PoolError:
+            # 不是从池中借出的连接（例如池已重建），直接关闭
+            super().close()
+        finally:
+            self._returning = False
+
 
 def ensure_postgres_configured():
     """确保应用只连接 PostgreSQL，避免误回退到历史 SQLite 数据库。"""
@@ -15,38 +55,93 @@ def ensure_postgres_configured():
         )
 
 
+def _get_pool():
+    """惰性创建进程级线程安全连接池。"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = psycopg2.pool.ThreadedConnectionPool(
+                    DB_POOL_MIN,
+                    DB_POOL_MAX,
+                    DATABASE_URL,
+                    connection_factory=PooledConnection,
+                )
+                logger.info(f"已创建 PostgreSQL 连接池: min={DB_POOL_MIN}, max={DB_POOL_MAX}")
+    return _pool
+
+
 def get_postgres_connection():
-    """创建 PostgreSQL 连接。后续可以在这里替换成连接池。"""
+    """从连接池借出 PostgreSQL 连接；调用方照常 conn.close() 即可归还。"""
     ensure_postgres_configured()
-    return psycopg2.connect(DATABASE_URL)
+    try:
+        return _get_pool().getconn()
+    except psycopg2.pool.PoolError:
+        # 连接池已满时退回到独立连接，避免请求直接失败
+        logger.warning("PostgreSQL 连接池已耗尽，临时创建独立连接")
+        return psycopg2.connect(DATABASE_URL)
 
 
-def execute_postgres_query(query, params=(), fetch=False, return_cursor=False):
-    """执行PostgreSQL查询并返回结果"""
+@contextmanager
+def db_connection():
+    """借出连接池中的连接，with 块结束时归还；块内抛出异常时先回滚。提交由调用方负责。"""
     conn = get_postgres_connection()
-    cursor = conn.cursor()
+    try:
+        yield conn
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
 
+
+def execute_prepared(cursor, name, sql, params=()):
+    """以服务端预备语句执行 SQL（占位符为 $1、$2 ...）。
+
+    池化连接上每个语句名只 PREPARE 一次，之后只发送 EXECUTE，省去重复解析与规划；
+    非池化的临时连接每次都重新 PREPARE。
+    """
+    prepared = getattr(cursor.connection, 'prepared_statements', None)
+    if not isinstance(prepared, set) or name not in prepared:
+        cursor.execute(f"PREPARE {name} AS {sql}")
+        if isinstance(prepared, set):
+            prepared.add(name)
     if params:
-        cursor.execute(query, params)
+        placeholders = ", ".join(["%s"] * len(params))
+        cursor.execute(f"EXECUTE {name} ({placeholders})", params)
     else:
-        cursor.execute(query)
+        cursor.execute(f"EXECUTE {name}")
 
-    if return_cursor:
-        conn.commit()
-        return cursor
 
-    result = None
-    if fetch:
-        result = cursor.fetchall()
+def execute_postgres_query(query, params=(), fetch=False, return_rowcount=False):
+    """执行PostgreSQL查询并返回结果"""
+    conn = get_postgres_connection()
+    try:
+        cursor = conn.cursor()
+
+        if params:
+            cursor.execute(query, params)
+        else:
+            cursor.execute(query)
+
+        if return_rowcount:
+            # 在归还连接之前读出受影响行数，调用方拿到的是整数而不是已失效的游标
+            rowcount = cursor.rowcount
+            conn.commit()
+            return rowcount
 
-    conn.commit()
-    conn.close()
-    return result
+        result = None
+        if fetch:
+            result = cursor.fetchall()
+
+        conn.commit()
+        return result
+    finally:
+        conn.close()
 
 
 # 数据库执行函数
-def execute_query(query, params=(), fetch=False, return_cursor=False):
-    """执行 PostgreSQL 查询并返回结果。"""
-    ensure_postgres_configured()
-    logger.debug(f"执行查询: {query[:50]}... 参数: {params}")
-    return execute_postgres_query(query, params, fetch, return_cursor)
+def execute_query(query, params=(), fetch=False, return_rowcount=False):
+    """执行 PostgreSQL 查询并返回结果。连接串校验在 get_postgres_connection 中完成。"""
+    logger.debug("执行查询: %.50s... 参数: %s", query, params)
+    return execute_postgres_query(query, params, fetch, return_rowcount)
@@ -58,7 +58,8 @@ def init_postgres_db():
             notified INTEGER DEFAULT 0,
             web_user_id TEXT,
             user_id INTEGER,
-            refunded INTEGER DEFAULT 0
+            refunded INTEGER DEFAULT 0,
+            notify_claimed_at TIMESTAMPTZ
         )
     """)
 
@@ -115,6 +116,13 @@ def init_postgres_db():
         logger.info("为orders表添加refunded列")
         c.execute("ALTER TABLE orders ADD COLUMN refunded INTEGER DEFAULT 0")
 
+    # 检查是否需要添加notify_claimed_at列（新订单推送认领时间）
+    try:
+        c.execute("SELECT notify_claimed_at FROM orders LIMIT 1")
+    except psycopg2.errors.UndefinedColumn:
+        logger.info("为orders表添加notify_claimed_at列")
+        c.execute("ALTER TABLE orders ADD COLUMN notify_claimed_at TIMESTAMPTZ")
+
     # 检查是否需要添加balance列（用户余额）
     try:
         c.execute("SELECT balance FROM users LIMIT 1")
@@ -175,6 +183,9 @@ def create_performance_indexes():
         "CREATE INDEX IF NOT EXISTS idx_orders_notified_status ON orders (notified, status)",
         "CREATE INDEX IF NOT EXISTS idx_orders_created_at ON orders (created_at)",
         "CREATE INDEX IF NOT EXISTS idx_orders_status_created_at ON orders (status, created_at)",
+        # 统计查询：按卖家/全体统计某时间段内完成的订单
+        "CREATE INDEX IF NOT EXISTS idx_orders_completed_by_seller ON orders (accepted_by, completed_at) WHERE status = 'completed'",
+        "CREATE INDEX IF NOT EXISTS idx_orders_completed_at ON orders (completed_at) WHERE status = 'completed'",
         "CREATE INDEX IF NOT EXISTS idx_balance_records_user_created ON balance_records (user_id, created_at)",
         "CREATE INDEX IF NOT EXISTS idx_balance_records_created_at ON balance_records (created_at)",
         "CREATE INDEX IF NOT EXISTS idx_recharge_requests_user_status ON recharge_requests (user_id, status)",
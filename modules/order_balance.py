@@ -1,22 +1,21 @@
 import logging
 from datetime import datetime
-
-import pytz
+from zoneinfo import ZoneInfo
 
 from modules.constants import STATUS
-from modules.db_core import execute_query, get_postgres_connection
+from modules.db_core import execute_prepared, execute_query, get_postgres_connection
 
 logger = logging.getLogger(__name__)
 
-CN_TIMEZONE = pytz.timezone('Asia/Shanghai')
+CN_TIMEZONE = ZoneInfo('Asia/Shanghai')
+# 与 get_china_time() 同格式的数据库端时间表达式，可直接嵌入 UPDATE/INSERT，省去 Python 侧格式化
+CN_NOW_SQL = "to_char(NOW() AT TIME ZONE 'Asia/Shanghai', 'YYYY-MM-DD HH24:MI:SS')"
 
 
 # 获取中国时间的函数
 def get_china_time():
     """获取当前中国时间（UTC+8）"""
-    utc_now = datetime.now(pytz.utc)
-    china_now = utc_now.astimezone(CN_TIMEZONE)
-    return china_now.strftime("%Y-%m-%d %H:%M:%S")
+    return datetime.now(CN_TIMEZONE).strftime("%Y-%m-%d %H:%M:%S")
 
 def add_balance_record(user_id, amount, type_name, reason, reference_id=None, balance_after=None):
     """
@@ -52,12 +51,15 @@ def add_balance_record(user_id, amount, type_name, reason, reference_id=None, ba
         return None
 
 # 获取未通知订单
+# 可以认领推送的订单：未通知，或推送认领超过 5 分钟仍未结算（推送途中进程退出等）
+NOTIFY_CLAIMABLE_SQL = "(notified = 0 OR notify_claimed_at < NOW() - INTERVAL '5 minutes')"
+
 def get_unnotified_orders():
-    """获取未通知的订单"""
-    orders = execute_query("""
+    """获取未通知的订单（含认领已超时的订单）"""
+    orders = execute_query(f"""
         SELECT id, account, password, package, created_at, web_user_id 
         FROM orders 
-        WHERE notified = 0 AND status = %s
+        WHERE {NOTIFY_CLAIMABLE_SQL} AND status = %s
     """, (STATUS['SUBMITTED'],), fetch=True)
     
     # 记录获取到的未通知订单
@@ -66,44 +68,67 @@ def get_unnotified_orders():
     
     return orders
 
+# 接单路径上的语句以服务端预备语句执行（占位符为 $n），每个池化连接只解析一次
+SQL_ACCEPT_TRY_LOCK = "SELECT pg_try_advisory_xact_lock(hashtext('accept_' || $1::text))"
+SQL_ACCEPT_LOCK_ORDER = "SELECT status FROM orders WHERE id = $1 FOR UPDATE"
+SQL_ACCEPT_SELLER_COUNTS = """
+    SELECT COUNT(*) FILTER (WHERE status = 'disputing'),
+           COUNT(*) FILTER (WHERE status = 'accepted')
+    FROM orders
+    WHERE accepted_by = $1 AND status IN ('disputing', 'accepted')
+"""
+SQL_ACCEPT_UPDATE_ORDER = f"""
+    UPDATE orders
+    SET status = 'accepted',
+        accepted_at = {CN_NOW_SQL},
+        accepted_by = $1,
+        accepted_by_username = $2,
+        accepted_by_first_name = $3
+    WHERE id = $4 AND status = 'submitted'
+    RETURNING id, account, password, package, accepted_by_username, accepted_by_first_name
+"""
+
 # 接单原子操作
 def accept_order_atomic(oid, user_id):
-    """原子接单；Postgres-only。"""
+    """原子接单；Postgres-only。
+
+    返回:
+    - (success, message, order)；成功时 order 为 UPDATE ... RETURNING 得到的订单字典
+    """
     conn = get_postgres_connection()
     cursor = conn.cursor()
 
     try:
-        cursor.execute("SELECT status FROM orders WHERE id = %s FOR UPDATE", (oid,))
+        # 事务级 advisory lock：同一订单的并发接单请求直接返回，跨进程/重启同样有效，事务结束自动释放
+        execute_prepared(cursor, "accept_try_lock", SQL_ACCEPT_TRY_LOCK, (str(oid),))
+        if not cursor.fetchone()[0]:
+            conn.rollback()
+            return False, "Order is being processed, please try again", None
+
+        execute_prepared(cursor, "accept_lock_order", SQL_ACCEPT_LOCK_ORDER, (oid,))
         order = cursor.fetchone()
         if not order:
             conn.rollback()
-            return False, "Order not found"
+            return False, "Order not found", None
 
         if order[0] == 'cancelled':
             conn.rollback()
-            return False, "Order has been cancelled"
+            return False, "Order has been cancelled", None
 
         if order[0] != 'submitted':
             conn.rollback()
-            return False, "Order already taken"
+            return False, "Order already taken", None
 
-        cursor.execute("""
-            SELECT COUNT(*) FROM orders
-            WHERE accepted_by = %s AND status = 'disputing'
-        """, (str(user_id),))
-        disputing_count = cursor.fetchone()[0]
+        # 一次查询同时统计质疑中和处理中的订单数
+        execute_prepared(cursor, "accept_seller_counts", SQL_ACCEPT_SELLER_COUNTS, (str(user_id),))
+        disputing_count, active_count = cursor.fetchone()
         if disputing_count > 0:
             conn.rollback()
-            return False, "You have a disputed order. Please resolve it before accepting new orders."
+            return False, "You have a disputed order. Please resolve it before accepting new orders.", None
 
-        cursor.execute("""
-            SELECT COUNT(*) FROM orders
-            WHERE accepted_by = %s AND status = 'accepted'
-        """, (str(user_id),))
-        active_count = cursor.fetchone()[0]
         if active_count >= 3:
             conn.rollback()
-            return False, "You already have 3 active orders. Please complete your current orders first before accepting new ones."
+            return False, "You already have 3 active orders. Please complete your current orders first before accepting new ones.", None
 
         from modules.constants import user_info_cache
         cached_user = user_info_cache.get(user_id, {})
@@ -114,27 +139,23 @@ def accept_order_atomic(oid, user_id):
         if first_name:
             full_name = f"{first_name} {last_name}".strip() if last_name else first_name
 
-        timestamp = get_china_time()
-        cursor.execute(
-            """
-            UPDATE orders
-            SET status = 'accepted',
-                accepted_at = %s,
-                accepted_by = %s,
-                accepted_by_username = %s,
-                accepted_by_first_name = %s
-            WHERE id = %s
-            """,
-            (timestamp, str(user_id), username, full_name, oid),
+        execute_prepared(
+            cursor, "accept_update_order", SQL_ACCEPT_UPDATE_ORDER,
+            (str(user_id), username, full_name, oid),
         )
+        row = cursor.fetchone()
+        if not row:
+            conn.rollback()
+            return False, "Order already taken", None
 
         conn.commit()
-        return True, "Success"
+        columns = ('id', 'account', 'password', 'package', 'accepted_by_username', 'accepted_by_first_name')
+        return True, "Success", dict(zip(columns, row))
 
     except Exception as e:
         conn.rollback()
         logger.error(f"Error in accept_order_atomic: {str(e)}")
-        return False, "Database error"
+        return False, "Database error", None
     finally:
         conn.close()
 
@@ -1,6 +1,7 @@
 import hashlib
 import logging
 
+from modules.cache_utils import ttl_cache
 from modules.db_core import execute_query
 from modules.order_balance import get_china_time
 
@@ -13,6 +14,12 @@ def hash_password(password):
 
 
 # ===== 卖家管理 =====
+def invalidate_seller_caches():
+    """卖家增删改后清空进程内的卖家缓存"""
+    get_active_seller_ids.cache_clear()
+    get_active_seller_id_set.cache_clear()
+
+
 def get_all_sellers():
     """获取所有卖家信息"""
     return execute_query("""
@@ -24,12 +31,19 @@ def get_all_sellers():
     """, fetch=True)
 
 
+@ttl_cache(60)
 def get_active_seller_ids():
     """获取所有活跃的卖家Telegram ID"""
     sellers = execute_query("SELECT telegram_id FROM sellers WHERE is_active = TRUE", fetch=True)
     return [seller[0] for seller in sellers]
 
 
+@ttl_cache(60)
+def get_active_seller_id_set():
+    """活跃卖家 ID 的 frozenset，供各处理函数做 O(1) 的卖家身份判断"""
+    return frozenset(get_active_seller_ids())
+
+
 def add_seller(telegram_id, username, first_name, added_by):
     """添加新卖家"""
     timestamp = get_china_time()
@@ -37,16 +51,20 @@ def add_seller(telegram_id, username, first_name, added_by):
         "INSERT INTO sellers (telegram_id, username, first_name, added_at, added_by) VALUES (%s, %s, %s, %s, %s)",
         (telegram_id, username, first_name, timestamp, added_by)
     )
+    invalidate_seller_caches()
 
 
 def toggle_seller_status(telegram_id):
     """切换卖家活跃状态"""
     execute_query("UPDATE sellers SET is_active = NOT is_active WHERE telegram_id = %s", (telegram_id,))
+    invalidate_seller_caches()
 
 
 def remove_seller(telegram_id):
     """移除卖家"""
-    return execute_query("DELETE FROM sellers WHERE telegram_id=%s", (telegram_id,))
+    result = execute_query("DELETE FROM sellers WHERE telegram_id=%s", (telegram_id,))
+    invalidate_seller_caches()
+    return result
 
 
 def toggle_seller_admin(telegram_id):
@@ -68,6 +86,7 @@ def toggle_seller_admin(telegram_id):
             "UPDATE sellers SET is_admin = %s WHERE telegram_id = %s",
             (new_status, telegram_id)
         )
+        invalidate_seller_caches()
         return True
     except Exception as e:
         logger.error(f"切换卖家管理员状态失败: {e}")
@@ -1,10 +1,19 @@
 import asyncio
+from collections import defaultdict
 import logging
 from datetime import datetime, timedelta
-import time
 import os
+import signal
+import threading
 from functools import wraps
 import functools
+import itertools
+import operator
+
+try:
+    import uvloop
+except ImportError:  # Windows 或未安装时回退到标准事件循环
+    uvloop = None
 
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import (
@@ -17,26 +26,29 @@ from telegram.ext import (
 )
 
 from modules.constants import (
-    BOT_TOKEN, STATUS, PLAN_LABELS_EN,
-    STATUS_TEXT_ZH, TG_PRICES, WEB_PRICES, SELLER_CHAT_IDS
+    BOT_TOKEN, STATUS, PLAN_LABELS_EN, TG_PRICES, SUPER_ADMIN_ID,
+    user_info_cache
 )
 from modules.database import (
-    get_order_details, accept_order_atomic, execute_query,
-    get_unnotified_orders, get_active_seller_ids, approve_recharge_request, reject_recharge_request,
-    get_china_time, get_postgres_connection
+    accept_order_atomic, execute_query,
+    get_unnotified_orders, get_active_seller_ids, get_active_seller_id_set, approve_recharge_request, reject_recharge_request,
+    get_china_time, db_connection
 )
+from modules.order_balance import CN_NOW_SQL, CN_TIMEZONE, NOTIFY_CLAIMABLE_SQL
+from modules.cache_utils import TTLDict
 
 logger = logging.getLogger(__name__)
 
-# 获取数据库连接
-def get_db_connection():
-    """获取 PostgreSQL 数据库连接。"""
-    
-    try:
-        return get_postgres_connection()
-    except Exception as e:
-        logger.error(f"获取数据库连接时出错: {str(e)}", exc_info=True)
-        return None
+# 回调与推送路径上复用的 SQL 语句（仅 PostgreSQL，占位符固定为 %s）
+# 推送前认领（notified=1 且记录认领时间），送达后清除认领时间，未送达则撤销认领；
+# 进程在推送途中退出留下的认领超时后可被重新认领，订单不会永远停在"已通知"
+SQL_CLAIM_NOTIFY_MANY = f"UPDATE orders SET notified = 1, notify_claimed_at = NOW() WHERE id = ANY(%s) AND {NOTIFY_CLAIMABLE_SQL} RETURNING id"
+SQL_CONFIRM_NOTIFY_MANY = "UPDATE orders SET notify_claimed_at = NULL WHERE id = ANY(%s)"
+SQL_RELEASE_NOTIFY_MANY = "UPDATE orders SET notified = 0, notify_claimed_at = NULL WHERE id = ANY(%s)"
+# 完成/失败只作用于本人接下且仍在处理中（已接单或被质疑）的订单，RETURNING 用于判断是否真的更新
+SQL_COMPLETE_ORDER = f"UPDATE orders SET status=%s, completed_at={CN_NOW_SQL} WHERE id=%s AND accepted_by=%s AND status IN (%s, %s) RETURNING id"
+SQL_FAIL_ORDER = f"UPDATE orders SET status=%s, completed_at={CN_NOW_SQL}, remark=%s WHERE id=%s AND accepted_by=%s AND status IN (%s, %s) RETURNING id"
+SQL_SET_REMARK = "UPDATE orders SET remark=%s WHERE id=%s"
 
 # 错误处理装饰器
 def callback_error_handler(func):
@@ -73,24 +85,100 @@ def callback_error_handler(func):
 # ===== 全局变量 =====
 bot_application = None
 BOT_LOOP = None
+# 关闭事件：bot_main 等待它被置位后优雅退出；在 run_bot 中于 BOT_LOOP 上创建
+_shutdown_event = None
 
-# 跟踪等待额外反馈的订单
-feedback_waiting = {}
-
-# 用户信息缓存
-user_info_cache = {}
+# 等待填写失败原因的卖家：user_id -> 订单ID；10 分钟未回复即作废，避免残留状态吞掉后续消息
+feedback_waiting = TTLDict(ttl=600)
 
 # ===== TG 辅助函数 =====
-def is_seller(chat_id):
+# 处理函数中的数据库调用一律经 asyncio.to_thread 在线程池中执行（连接池是线程安全的），
+# 慢查询不会阻塞事件循环上的其他更新和推送
+def _read_file_bytes(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+async def read_photo_bytes(path):
+    """在线程池中读取图片字节，避免阻塞事件循环。
+    不缓存内容：同一文件首次上传后由 send_photo_cached 复用 file_id，不会再次读取。"""
+    return await asyncio.get_running_loop().run_in_executor(None, _read_file_bytes, path)
+
+# 已上传图片的 Telegram file_id：(绝对路径, mtime) -> file_id
+_photo_file_ids = {}
+
+async def send_photo_cached(chat_id, path, **kwargs):
+    """发送本地图片；同一文件首次上传后复用 Telegram 返回的 file_id，不再重复上传"""
+    path = os.path.abspath(path)
+    mtime = await asyncio.get_running_loop().run_in_executor(None, os.path.getmtime, path)
+    file_id = _photo_file_ids.get((path, mtime))
+    if file_id:
+        return await bot_application.bot.send_photo(chat_id=chat_id, photo=file_id, **kwargs)
+
+    photo_bytes = await read_photo_bytes(path)
+    sent = await bot_application.bot.send_photo(chat_id=chat_id, photo=photo_bytes, **kwargs)
+    if sent and sent.photo:
+        if len(_photo_file_ids) >= 256:
+            # 按插入顺序淘汰最早的记录，保证缓存有界
+            _photo_file_ids.pop(next(iter(_photo_file_ids)))
+        _photo_file_ids[(path, mtime)] = sent.photo[-1].file_id
+    return sent
+
+# ===== 常用按钮 =====
+# InlineKeyboardMarkup 创建后不可变，按钮文案固定的键盘直接复用；按订单号变化的键盘每次现建，不做缓存
+@functools.lru_cache(maxsize=64)
+def _noop_markup(label):
+    """只有一个不可点击（noop）按钮的键盘，用于显示订单最终状态"""
+    return InlineKeyboardMarkup([[InlineKeyboardButton(label, callback_data="noop")]])
+
+def _done_fail_markup(oid, done_label="✅ Complete", fail_label="❌ Failed"):
+    """订单处理中的 完成/失败 按钮（各入口沿用各自原有的按钮文案）"""
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton(done_label, callback_data=f"done_{oid}"),
+         InlineKeyboardButton(fail_label, callback_data=f"fail_{oid}")]
+    ])
+
+def _fail_reasons_markup(oid):
+    """点击失败后显示的原因选项"""
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton("🔑 Wrong Password", callback_data=f"reason_wrong_password_{oid}")],
+        [InlineKeyboardButton("⏱️ Membership Not Expired", callback_data=f"reason_not_expired_{oid}")],
+        [InlineKeyboardButton("❓ Other Reason", callback_data=f"reason_other_{oid}")],
+        [InlineKeyboardButton("↩️ Cancel (Clicked by Mistake)", callback_data=f"reason_cancel_{oid}")]
+    ])
+
+# /stats 时间段选择菜单：普通卖家与超级管理员（多一个 All Sellers 入口）
+_STATS_PERIOD_ROWS = (
+    (
+        InlineKeyboardButton("📅 Today", callback_data="stats_today_personal"),
+        InlineKeyboardButton("📅 Yesterday", callback_data="stats_yesterday_personal"),
+    ),
+    (
+        InlineKeyboardButton("📊 This Week", callback_data="stats_week_personal"),
+        InlineKeyboardButton("📊 This Month", callback_data="stats_month_personal"),
+    ),
+)
+STATS_KEYBOARD_PERSONAL = InlineKeyboardMarkup(_STATS_PERIOD_ROWS)
+STATS_KEYBOARD_ALL = InlineKeyboardMarkup(_STATS_PERIOD_ROWS + (
+    (InlineKeyboardButton("👥 All Sellers", callback_data="stats_all_sellers_menu"),),
+))
+STATS_BACK_MARKUP = InlineKeyboardMarkup([[InlineKeyboardButton("⬅️ Back", callback_data="stats_back")]])
+
+# 失败原因 -> 最终状态按钮文案
+_FAIL_REASON_LABELS = {
+    "wrong_password": "🔑 Failed: Wrong Password",
+    "not_expired": "⏱️ Failed: Membership Not Expired",
+    "other": "❓ Failed: Other Reason",
+}
+
+async def is_seller(chat_id):
     """检查用户是否为已授权的卖家"""
-    # 只从数据库中获取卖家信息，因为环境变量中的卖家已经同步到数据库
-    return chat_id in get_active_seller_ids()
+    # 只从数据库中获取卖家信息，因为环境变量中的卖家已经同步到数据库；
+    # 缓存未命中时会查库，放到线程中执行，不阻塞机器人事件循环
+    return chat_id in await asyncio.to_thread(get_active_seller_id_set)
 
 # 添加处理 Telegram webhook 更新的函数
-async def process_telegram_update_async(update_data, notification_queue):
-    """异步处理来自Telegram webhook的更新"""
-    global bot_application
-    
+def _enqueue_update(update_data):
+    """在机器人事件循环中运行：解析 webhook 数据并放入 Application 的更新队列"""
     try:
         if not bot_application:
             logger.error("机器人应用未初始化，无法处理webhook更新")
@@ -103,48 +191,45 @@ async def process_telegram_update_async(update_data, notification_queue):
             logger.error("无法将webhook数据转换为Update对象")
             return
         
-        # 处理更新
-        logger.info(f"正在处理webhook更新: {update.update_id}")
-        
-        # 将更新分派给应用程序处理
-        await bot_application.process_update(update)
-        
-        logger.info(f"webhook更新 {update.update_id} 处理完成")
+        # 交给 Application 自己的更新队列分发，处理过程与 webhook 请求完全解耦
+        bot_application.update_queue.put_nowait(update)
+        logger.info(f"webhook更新 {update.update_id} 已进入更新队列")
     
     except Exception as e:
         logger.error(f"处理webhook更新时出错: {str(e)}", exc_info=True)
 
 def process_telegram_update(update_data, notification_queue):
-    """处理来自Telegram webhook的更新（同步包装器）"""
-    global BOT_LOOP
-    
+    """提交来自Telegram webhook的更新（非阻塞，可在 Flask 请求线程中直接调用）
+
+    只把更新投递到机器人事件循环即返回，webhook 可以立即应答 200；
+    handler 的数据库访问和消息编辑都在事件循环中由 Application 异步完成。
+    """
     try:
         if not BOT_LOOP:
             logger.error("机器人事件循环未初始化，无法处理webhook更新")
             return
         
-        # 在机器人的事件循环中运行异步处理函数
-        asyncio.run_coroutine_threadsafe(
-            process_telegram_update_async(update_data, notification_queue),
-            BOT_LOOP
-        )
-        
-        logger.info("已将webhook更新提交到机器人事件循环处理")
+        BOT_LOOP.call_soon_threadsafe(_enqueue_update, update_data)
     
     except Exception as e:
         logger.error(f"提交webhook更新到事件循环时出错: {str(e)}", exc_info=True)
 
-async def get_user_info(user_id):
-    """获取Telegram用户信息并缓存"""
-    global bot_application, user_info_cache
-    
-    if not bot_application:
-        return {"id": user_id, "username": str(user_id), "first_name": str(user_id), "last_name": ""}
-    
-    # 检查缓存
-    if user_id in user_info_cache:
-        return user_info_cache[user_id]
-    
+def _seed_user_cache(user):
+    """用 Update 自带的用户资料预填缓存，省去一次 get_chat 请求"""
+    if not user:
+        return
+    user_info_cache[user.id] = {
+        "id": user.id,
+        "username": user.username or str(user.id),
+        "first_name": user.first_name or str(user.id),
+        "last_name": user.last_name or ""
+    }
+
+# 正在进行中的 get_chat 请求，同一用户的并发查询共享一次 API 调用
+_user_info_inflight = {}
+
+async def _fetch_user_info(user_id):
+    """调用 Telegram API 获取用户信息并写入缓存；失败时缓存默认值"""
     try:
         user = await bot_application.bot.get_chat(user_id)
         user_info = {
@@ -161,49 +246,32 @@ async def get_user_info(user_id):
         user_info_cache[user_id] = default_info
         return default_info
 
-# ===== TG 命令处理 =====
-processing_accepts = set()
-processing_accepts_time = {}  # 记录每个接单请求的开始时间
-
-# 清理超时的处理中请求
-async def cleanup_processing_accepts():
-    """定期清理超时的处理中请求"""
-    global processing_accepts, processing_accepts_time
-    current_time = time.time()
-    timeout_keys = []
+async def get_user_info(user_id):
+    """获取Telegram用户信息并缓存"""
+    global bot_application
     
-    try:
-        # 检查所有处理中的请求
-        for key, start_time in list(processing_accepts_time.items()):
-            # 如果请求处理时间超过30秒，认为超时
-            if current_time - start_time > 30:
-                timeout_keys.append(key)
-        
-        # 从集合中移除超时的请求
-        for key in timeout_keys:
-            if key in processing_accepts:
-                processing_accepts.remove(key)
-                logger.info(f"已清理超时的接单请求: {key}")
-            if key in processing_accepts_time:
-                del processing_accepts_time[key]
-                
-        # 检查是否有不一致的数据（在processing_accepts中但不在processing_accepts_time中）
-        for key in list(processing_accepts):
-            if key not in processing_accepts_time:
-                processing_accepts.remove(key)
-                logger.warning(f"清理了不一致的接单请求数据: {key}")
-        
-        # 日志记录当前处理中的请求数量
-        if processing_accepts:
-            logger.debug(f"当前有 {len(processing_accepts)} 个处理中的接单请求")
-    except Exception as e:
-        logger.error(f"清理超时的接单请求时出错: {str(e)}", exc_info=True)
+    if not bot_application:
+        return {"id": user_id, "username": str(user_id), "first_name": str(user_id), "last_name": ""}
+    
+    # 检查缓存
+    if user_id in user_info_cache:
+        return user_info_cache[user_id]
+    
+    pending = _user_info_inflight.get(user_id)
+    if pending is None:
+        pending = asyncio.ensure_future(_fetch_user_info(user_id))
+        _user_info_inflight[user_id] = pending
+        pending.add_done_callback(lambda _: _user_info_inflight.pop(user_id, None))
+    # shield：某个调用方被取消时不影响其他等待同一请求的调用方
+    return await asyncio.shield(pending)
 
+# ===== TG 命令处理 =====
 async def on_test(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """测试命令处理函数"""
     user_id = update.effective_user.id
+    _seed_user_cache(update.effective_user)
     
-    if not is_seller(user_id):
+    if not await is_seller(user_id):
         await update.message.reply_text("⚠️ You do not have permission to use this command.")
         return
     
@@ -219,8 +287,9 @@ async def on_test(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def on_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """开始命令处理"""
     user_id = update.effective_user.id
+    _seed_user_cache(update.effective_user)
     
-    if is_seller(user_id):
+    if await is_seller(user_id):
         await update.message.reply_text(
             "🌟 *Welcome to the Premium Recharge System!* 🌟\n\n"
             "As a verified seller, you have access to:\n"
@@ -237,11 +306,39 @@ async def on_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
             parse_mode='Markdown'
         )
 
+def get_seller_dispatch_state(user_id):
+    """返回 (活跃订单数, 最近 5 条已接/失败订单, 最近 5 条待接订单)；三者合并为一次往返"""
+    rows = execute_query("""
+        WITH mine AS (
+            SELECT id, account, password, package, status AS extra,
+                   COUNT(*) FILTER (WHERE status = %s) OVER () AS active_count
+            FROM orders
+            WHERE accepted_by = %s AND status IN (%s, %s)
+            ORDER BY id DESC LIMIT 5
+        ), fresh AS (
+            SELECT id, account, password, package, created_at AS extra
+            FROM orders
+            WHERE status = %s
+            ORDER BY id DESC LIMIT 5
+        )
+        SELECT 'M' AS kind, id, account, password, package, extra, active_count FROM mine
+        UNION ALL
+        SELECT 'N', id, account, password, package, extra, NULL FROM fresh
+        ORDER BY kind, id DESC
+    """, (STATUS['ACCEPTED'], str(user_id), STATUS['ACCEPTED'], STATUS['FAILED'],
+          STATUS['SUBMITTED']), fetch=True) or []
+    my_orders = [row[1:6] for row in rows if row[0] == 'M']
+    new_orders = [row[1:6] for row in rows if row[0] == 'N']
+    # 窗口计数在 LIMIT 之前计算，任取一行即可
+    active_count = next((row[6] for row in rows if row[0] == 'M'), 0)
+    return active_count, my_orders, new_orders
+
 async def on_admin_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """处理卖家命令"""
     user_id = update.effective_user.id
+    _seed_user_cache(update.effective_user)
     
-    if not is_seller(user_id):
+    if not await is_seller(user_id):
         await update.message.reply_text(
             "⚠️ *Access Denied* ⚠️\n\n"
             "You are not authorized to use this command.",
@@ -249,13 +346,10 @@ async def on_admin_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return
     
-    # 首先检查当前用户的活跃订单数
-    active_orders_count = execute_query("""
-        SELECT COUNT(*) FROM orders 
-        WHERE accepted_by = %s AND status = %s
-    """, (str(user_id), STATUS['ACCEPTED']), fetch=True)[0][0]
+    # 一次查询拿到活跃订单数、最近的我的订单和待接订单
+    active_orders_count, my_orders, new_orders = await asyncio.to_thread(get_seller_dispatch_state, user_id)
     
-    # 发送当前状态
+    # 当前状态
     if active_orders_count >= 3:
         status_icon = "🔴"
         status_message = f"{status_icon} *Seller Status:* {active_orders_count}/3 active orders\n⚠️ *Maximum limit reached.* Please complete existing orders first."
@@ -263,48 +357,27 @@ async def on_admin_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         status_icon = "🟢" 
         status_message = f"{status_icon} *Seller Status:* {active_orders_count}/3 active orders\n✅ *You can accept new orders.*"
     
+    # 状态与待接订单标题合并为一条消息发送
+    if new_orders:
+        status_message += "\n\n📋 *Available Orders*"
+    else:
+        status_message += "\n\n📭 *No pending orders available at this time.*"
     await update.message.reply_text(
         status_message,
         parse_mode='Markdown'
     )
     
-    # 查询待处理订单
-    new_orders = execute_query("""
-        SELECT id, account, password, package, created_at FROM orders 
-        WHERE status = %s ORDER BY id DESC LIMIT 5
-    """, (STATUS['SUBMITTED'],), fetch=True)
-    
-    my_orders = execute_query("""
-        SELECT id, account, password, package, status FROM orders 
-        WHERE accepted_by = %s AND status IN (%s, %s) ORDER BY id DESC LIMIT 5
-    """, (str(user_id), STATUS['ACCEPTED'], STATUS['FAILED']), fetch=True)
-    
-    # 发送订单信息
-    if new_orders:
-        await update.message.reply_text(
-            "📋 *Available Orders*",
-            parse_mode='Markdown'
-        )
-        for order in new_orders:
-            oid, account, password, package, created_at = order
-            
-            keyboard = [[InlineKeyboardButton("✅ Accept Order", callback_data=f"accept_{oid}")]]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            
-            # 接单前不显示密码
-            await update.message.reply_text(
-                f"🔹 *Order #{oid}* - {created_at}\n\n"
-                f"• 👤 Account: `{account}`\n"
-                f"• 📦 Package: *{PLAN_LABELS_EN[package]}*\n"
-                f"• 💰 Payment: *${TG_PRICES[package]}*",
-                reply_markup=reply_markup,
-                parse_mode='Markdown'
-            )
-    else:
-        await update.message.reply_text(
-            "📭 *No pending orders available at this time.*",
+    # 每个订单仍是独立消息（接单/完成回调会原地编辑该消息）；逐条发送，保证按订单号从新到旧排列
+    for oid, account, password, package, created_at in new_orders:
+        # 接单前不显示密码
+        await _send_limited(update.message.reply_text(
+            f"🔹 *Order #{oid}* - {created_at}\n\n"
+            f"• 👤 Account: `{account}`\n"
+            f"• 📦 Package: *{PLAN_LABELS_EN[package]}*\n"
+            f"• 💰 Payment: *${TG_PRICES[package]}*",
+            reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("✅ Accept Order", callback_data=f"accept_{oid}")]]),
             parse_mode='Markdown'
-        )
+        ))
     
     # 发送我的订单
     if my_orders:
@@ -312,25 +385,18 @@ async def on_admin_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             "🔄 *Your Active Orders*", 
             parse_mode='Markdown'
         )
-        for order in my_orders:
-            oid, account, password, package, status = order
-            
-            if status == STATUS['ACCEPTED']:
-                keyboard = [
-                    [InlineKeyboardButton("✅ Mark Complete", callback_data=f"done_{oid}"),
-                     InlineKeyboardButton("❌ Mark Failed", callback_data=f"fail_{oid}")]
-                ]
-                reply_markup = InlineKeyboardMarkup(keyboard)
-                
-                await update.message.reply_text(
-                    f"🔸 *Order #{oid}*\n\n"
-                    f"• 👤 Account: `{account}`\n"
-                    f"• 🔑 Password: `{password}`\n"
-                    f"• 📦 Package: *{PLAN_LABELS_EN[package]}*\n"
-                    f"• 💰 Payment: *${TG_PRICES[package]}*",
-                    reply_markup=reply_markup,
-                    parse_mode='Markdown'
-                )
+        for oid, account, password, package, status in my_orders:
+            if status != STATUS['ACCEPTED']:
+                continue
+            await _send_limited(update.message.reply_text(
+                f"🔸 *Order #{oid}*\n\n"
+                f"• 👤 Account: `{account}`\n"
+                f"• 🔑 Password: `{password}`\n"
+                f"• 📦 Package: *{PLAN_LABELS_EN[package]}*\n"
+                f"• 💰 Payment: *${TG_PRICES[package]}*",
+                reply_markup=_done_fail_markup(oid, "✅ Mark Complete", "❌ Mark Failed"),
+                parse_mode='Markdown'
+            ))
 
 # ===== TG 回调处理 =====
 @callback_error_handler
@@ -338,15 +404,10 @@ async def on_accept(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """处理接单回调"""
     query = update.callback_query
     user_id = query.from_user.id
+    _seed_user_cache(query.from_user)
     
     logger.info(f"收到接单回调: 用户ID={user_id}, data={repr(query.data)}")
     
-    # 防止重复点击
-    if (user_id, query.data) in processing_accepts:
-        await query.answer("Processing, please don't click repeatedly")
-        logger.info(f"用户 {user_id} 重复点击了 {query.data}")
-        return
-        
     try:
         parts = query.data.split('_')
         logger.info(f"分割后的数据: {parts}")
@@ -369,51 +430,27 @@ async def on_accept(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await query.answer("Invalid order data", show_alert=True)
         return
 
-    # 添加到处理集合
-    processing_accepts.add((user_id, query.data))
-    processing_accepts_time[(user_id, query.data)] = time.time()
-
     logger.info(f"接单回调解析: 订单ID={oid}")
     
     try:
-        # 使用accept_order_atomic函数处理接单
-        success, message = accept_order_atomic(oid, user_id)
+        # 使用accept_order_atomic函数处理接单；并发点击由数据库 advisory lock 去重
+        success, message, order = await asyncio.to_thread(accept_order_atomic, oid, user_id)
         
         if not success:
-            # 从处理集合中移除
-            if (user_id, query.data) in processing_accepts:
-                processing_accepts.remove((user_id, query.data))
-            if (user_id, query.data) in processing_accepts_time:
-                del processing_accepts_time[(user_id, query.data)]
-            
             # 根据不同的错误消息显示不同的按钮状态
             if message == "Order has been cancelled":
-                keyboard = [[InlineKeyboardButton("Cancelled", callback_data="noop")]]
-                reply_markup = InlineKeyboardMarkup(keyboard)
-                await query.edit_message_reply_markup(reply_markup=reply_markup)
+                await query.edit_message_reply_markup(reply_markup=_noop_markup("Cancelled"))
             elif message == "Order already taken":
-                keyboard = [[InlineKeyboardButton("❌Already taken", callback_data="noop")]]
-                reply_markup = InlineKeyboardMarkup(keyboard)
-                await query.edit_message_reply_markup(reply_markup=reply_markup)
+                await query.edit_message_reply_markup(reply_markup=_noop_markup("❌Already taken"))
             
             await query.answer(message, show_alert=True)
             return
             
-        # 获取订单详情
-        order = get_order_by_id(oid)
-        if not order:
-            logger.error(f"订单 {oid} 接单成功后无法读取详情")
-            await query.answer("Order accepted, but failed to load details", show_alert=True)
-            return
-        
         # 确认回调
         await query.answer("You have successfully accepted the order!", show_alert=True)
         
         # 更新消息
-        keyboard = InlineKeyboardMarkup([
-            [InlineKeyboardButton("✅ Mark as Complete", callback_data=f"done_{oid}"),
-             InlineKeyboardButton("❌ Mark as Failed", callback_data=f"fail_{oid}")]
-        ])
+        keyboard = _done_fail_markup(oid, "✅ Mark as Complete", "❌ Mark as Failed")
         
         # 获取订单详情以显示
         account = order.get('account', '未知账号')
@@ -430,25 +467,16 @@ async def on_accept(update: Update, context: ContextTypes.DEFAULT_TYPE):
             reply_markup=keyboard,
             parse_mode='Markdown'
         )
-        
-        # 从处理集合中移除
-        if (user_id, query.data) in processing_accepts:
-            processing_accepts.remove((user_id, query.data))
-        if (user_id, query.data) in processing_accepts_time:
-            del processing_accepts_time[(user_id, query.data)]
             
         logger.info(f"订单 {oid} 已被用户 {user_id} 接受")
     except Exception as e:
         logger.error(f"处理订单 {oid} 接单请求时出错: {str(e)}", exc_info=True)
-        
-        # 从处理集合中移除
-        if (user_id, query.data) in processing_accepts:
-            processing_accepts.remove((user_id, query.data))
-        if (user_id, query.data) in processing_accepts_time:
-            del processing_accepts_time[(user_id, query.data)]
             
         await query.answer("Error processing order, please try again later", show_alert=True)
 
+# 完成/失败操作未命中订单（不属于该卖家或已处理）时的提示
+_ORDER_NOT_ACTIONABLE = "This order is not assigned to you or has already been processed."
+
 async def on_feedback_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """处理反馈按钮回调"""
     query = update.callback_query
@@ -457,29 +485,41 @@ async def on_feedback_button(update: Update, context: ContextTypes.DEFAULT_TYPE)
     
     logger.info(f"收到反馈按钮回调: 用户={user_id}, 数据={data}")
     
-    if not is_seller(user_id):
+    if not await is_seller(user_id):
         logger.warning(f"非管理员 {user_id} 尝试提交反馈")
         await query.answer("You are not an admin")
         return
     
-    # 先确认回调
-    try:    
-        await query.answer()
-    except Exception as e:
-        logger.error(f"确认反馈回调时出错: {str(e)}")
+    # Telegram 只接受对同一回调的一次 answer：各分支在结果确定后调用 answer，
+    # 重复调用被忽略，finally 中兜底确认未回应的回调
+    answered = False
+    async def answer(text=None, show_alert=False):
+        nonlocal answered
+        if answered:
+            return
+        answered = True
+        try:
+            await query.answer(text, show_alert=show_alert)
+        except Exception as e:
+            logger.error(f"确认反馈回调时出错: {str(e)}")
     
     try:
         if data.startswith('done_'):
             oid = int(data.split('_')[1])
             logger.info(f"管理员 {user_id} 标记订单 #{oid} 为已完成")
             
-            timestamp = get_china_time()
-            execute_query("UPDATE orders SET status=%s, completed_at=%s WHERE id=%s AND accepted_by=%s",
-                        (STATUS['COMPLETED'], timestamp, oid, str(user_id)))
+            updated = await asyncio.to_thread(execute_query, SQL_COMPLETE_ORDER,
+                        (STATUS['COMPLETED'], oid, str(user_id), STATUS['ACCEPTED'], STATUS['DISPUTING']), fetch=True)
+            if not updated:
+                logger.warning(f"订单 #{oid} 不属于用户 {user_id} 或已处理，忽略完成操作")
+                await answer(_ORDER_NOT_ACTIONABLE, show_alert=True)
+                return
+            invalidate_stats_caches()
+            await answer()
                         
             try:
                 await query.edit_message_reply_markup(
-                    reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("✅ Completed", callback_data="noop")]]))
+                    reply_markup=_noop_markup("✅ Completed"))
                 logger.info(f"已更新订单 #{oid} 的消息显示为已完成状态")
             except Exception as markup_error:
                 logger.error(f"更新已完成标记时出错: {str(markup_error)}")
@@ -489,22 +529,14 @@ async def on_feedback_button(update: Update, context: ContextTypes.DEFAULT_TYPE)
             logger.info(f"管理员 {user_id} 点击了失败按钮 #{oid}")
             
             # 显示失败原因选项（添加emoji）
-            keyboard = [
-                [InlineKeyboardButton("🔑 Wrong Password", callback_data=f"reason_wrong_password_{oid}")],
-                [InlineKeyboardButton("⏱️ Membership Not Expired", callback_data=f"reason_not_expired_{oid}")],
-                [InlineKeyboardButton("❓ Other Reason", callback_data=f"reason_other_{oid}")],
-                [InlineKeyboardButton("↩️ Cancel (Clicked by Mistake)", callback_data=f"reason_cancel_{oid}")]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            
             try:
-                await query.edit_message_reply_markup(reply_markup=reply_markup)
-                # 确保回调被确认
-                await query.answer("Please select a reason")
-                logger.info(f"已为订单 #{oid} 显示失败原因选项")
+                await query.edit_message_reply_markup(reply_markup=_fail_reasons_markup(oid))
             except Exception as markup_error:
                 logger.error(f"显示失败原因选项时出错: {str(markup_error)}")
-                await query.answer("Error updating options. Please try again.", show_alert=True)
+                await answer("Error updating options. Please try again.", show_alert=True)
+                return
+            await answer("Please select a reason")
+            logger.info(f"已为订单 #{oid} 显示失败原因选项")
         
         # 处理失败原因选项
         elif data.startswith('reason_'):
@@ -522,23 +554,15 @@ async def on_feedback_button(update: Update, context: ContextTypes.DEFAULT_TYPE)
             
             # 如果是取消，恢复原始按钮
             if reason_type == "cancel":
-                keyboard = [
-                    [InlineKeyboardButton("✅ Complete", callback_data=f"done_{oid}"),
-                     InlineKeyboardButton("❌ Failed", callback_data=f"fail_{oid}")]
-                ]
-                reply_markup = InlineKeyboardMarkup(keyboard)
-                
                 try:
-                    await query.edit_message_reply_markup(reply_markup=reply_markup)
-                    await query.answer("Operation cancelled.")
+                    await query.edit_message_reply_markup(reply_markup=_done_fail_markup(oid))
                     logger.info(f"已取消订单 #{oid} 的失败操作")
                 except Exception as cancel_error:
                     logger.error(f"取消失败操作时出错: {str(cancel_error)}")
+                await answer("Operation cancelled.")
                 return
             
             # 处理其他原因类型
-            timestamp = get_china_time()
-            
             # 设置失败状态和原因（添加emoji）
             reason_text = ""
             if reason_type == "wrong_password":
@@ -547,108 +571,84 @@ async def on_feedback_button(update: Update, context: ContextTypes.DEFAULT_TYPE)
                 reason_text = "Membership not expired"
             elif reason_type == "other":
                 reason_text = "Other reason (details pending)"
-                # 标记需要额外反馈
-                feedback_waiting[user_id] = oid
             else:
                 # 处理未知的原因类型
                 reason_text = f"Unknown reason: {reason_type}"
             
             # 更新数据库
-            execute_query("UPDATE orders SET status=%s, completed_at=%s, remark=%s WHERE id=%s AND accepted_by=%s",
-                        (STATUS['FAILED'], timestamp, reason_text, oid, str(user_id)))
+            updated = await asyncio.to_thread(execute_query, SQL_FAIL_ORDER,
+                        (STATUS['FAILED'], reason_text, oid, str(user_id), STATUS['ACCEPTED'], STATUS['DISPUTING']), fetch=True)
+            if not updated:
+                # 未命中说明订单不属于该卖家或已处理过，不能重复退款
+                logger.warning(f"订单 #{oid} 不属于用户 {user_id} 或已处理，忽略失败操作")
+                await answer(_ORDER_NOT_ACTIONABLE, show_alert=True)
+                return
+            invalidate_stats_caches()
+            if reason_type == "other":
+                # 标记需要额外反馈
+                feedback_waiting[user_id] = oid
             
             # 执行退款操作
             from modules.database import refund_order
-            success, result = refund_order(oid)
+            success, result = await asyncio.to_thread(refund_order, oid)
             if success:
                 logger.info(f"订单退款成功: ID={oid}, 新余额={result}")
             else:
                 logger.warning(f"订单退款失败: ID={oid}, 原因={result}")
             
-            # 获取原始消息内容
-            original_text = query.message.text
-            
             # 更新UI - 保留原始消息，仅更改按钮
             try:
-                # 初始化keyboard变量，确保在所有情况下都有定义
-                keyboard = [[InlineKeyboardButton("❓ Failed", callback_data="noop")]]
-                
-                if reason_type == "wrong_password":
-                    keyboard = [[InlineKeyboardButton("🔑 Failed: Wrong Password", callback_data="noop")]]
-                elif reason_type == "not_expired":
-                    keyboard = [[InlineKeyboardButton("⏱️ Failed: Membership Not Expired", callback_data="noop")]]
-                elif reason_type == "other":
-                    keyboard = [[InlineKeyboardButton("❓ Failed: Other Reason", callback_data="noop")]]
-                else:
-                    keyboard = [[InlineKeyboardButton(f"❓ Failed: {reason_type}", callback_data="noop")]]
-                
-                reply_markup = InlineKeyboardMarkup(keyboard)
+                label = _FAIL_REASON_LABELS.get(reason_type, f"❓ Failed: {reason_type}")
                 
                 # 保留原始消息文本，只更新按钮
-                await query.edit_message_reply_markup(reply_markup=reply_markup)
-                
-                # 如果是"其他原因"，请求详细反馈
-                if reason_type == "other":
-                    # 先确认回调，避免"等待中"状态
-                    await query.answer("Please provide more details")
-                    await query.message.reply_text(
-                        "📝 Please provide more details about the failure reason. Your next message will be recorded as feedback."
-                    )
-                else:
-                    # 只显示回调确认，不发送额外消息
-                    await query.answer(f"Order marked as failed: {reason_text}")
-                
+                await query.edit_message_reply_markup(reply_markup=_noop_markup(label))
                 logger.info(f"已更新订单 #{oid} 的消息显示为失败状态，原因: {reason_text}")
             except Exception as markup_error:
                 logger.error(f"更新失败标记时出错: {str(markup_error)}", exc_info=True)
                 # 尝试通知用户出错了
-                await query.answer("Error updating UI. The order status has been updated.", show_alert=True)
+                await answer("Error updating UI. The order status has been updated.", show_alert=True)
+            
+            # 如果是"其他原因"，请求详细反馈
+            if reason_type == "other":
+                # 先确认回调，避免"等待中"状态
+                await answer("Please provide more details")
+                await query.message.reply_text(
+                    "📝 Please provide more details about the failure reason. Your next message will be recorded as feedback."
+                )
+            else:
+                # 只显示回调确认，不发送额外消息
+                await answer(f"Order marked as failed: {reason_text}")
     except ValueError as ve:
         logger.error(f"解析订单ID出错: {str(ve)}")
     except Exception as e:
         logger.error(f"处理反馈按钮回调时出错: {str(e)}", exc_info=True)
+    finally:
+        await answer()
 
 async def on_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """处理文本消息"""
     user_id = update.effective_user.id
     
     # 检查是否等待失败反馈
-    if user_id in feedback_waiting:
-        oid = feedback_waiting[user_id]
+    oid = feedback_waiting.pop(user_id)
+    if oid is not None:
         feedback = update.message.text
         
-        execute_query("UPDATE orders SET remark=%s WHERE id=%s", (feedback, oid))
-        del feedback_waiting[user_id]
+        await asyncio.to_thread(execute_query, SQL_SET_REMARK, (feedback, oid))
         
         await update.message.reply_text("Feedback recorded. Thank you.")
 
 async def on_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """处理统计命令"""
     user_id = update.effective_user.id
+    _seed_user_cache(update.effective_user)
     
-    if not is_seller(user_id):
+    if not await is_seller(user_id):
         await update.message.reply_text("You are not a seller and cannot use this command.")
         return
     
-    # 发送统计选择按钮
-    keyboard = [
-        [
-            InlineKeyboardButton("📅 Today", callback_data="stats_today_personal"),
-            InlineKeyboardButton("📅 Yesterday", callback_data="stats_yesterday_personal"),
-        ],
-        [
-            InlineKeyboardButton("📊 This Week", callback_data="stats_week_personal"),
-            InlineKeyboardButton("📊 This Month", callback_data="stats_month_personal")
-        ]
-    ]
-    
-    # 只有超级管理员（ID: 1878943383）可以查看所有人的统计
-    if user_id == 1878943383:
-        keyboard.append([
-            InlineKeyboardButton("👥 All Sellers", callback_data="stats_all_sellers_menu")
-        ])
-    
-    reply_markup = InlineKeyboardMarkup(keyboard)
+    # 发送统计选择按钮；只有超级管理员可以查看所有人的统计
+    reply_markup = STATS_KEYBOARD_ALL if user_id == SUPER_ADMIN_ID else STATS_KEYBOARD_PERSONAL
     await update.message.reply_text("Please select a time period to view statistics:", reply_markup=reply_markup)
 
 async def on_stats_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -657,40 +657,26 @@ async def on_stats_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = query.from_user.id
     data = query.data
     
-    if not is_seller(user_id):
+    if not await is_seller(user_id):
         await query.answer("You are not an admin")
         return
     
     await query.answer()
     
+    # 订单时间按中国时间存储，统计的“今天”也按中国时间计算，且每次回调只算一次
+    today = datetime.now(CN_TIMEZONE).date()
+    
     # 处理返回按钮
     if data == "stats_back":
         # 重新显示统计选择按钮
-        keyboard = [
-            [
-                InlineKeyboardButton("📅 Today", callback_data="stats_today_personal"),
-                InlineKeyboardButton("📅 Yesterday", callback_data="stats_yesterday_personal"),
-            ],
-            [
-                InlineKeyboardButton("📊 This Week", callback_data="stats_week_personal"),
-                InlineKeyboardButton("📊 This Month", callback_data="stats_month_personal")
-            ]
-        ]
-        if user_id == 1878943383:
-            keyboard.append([
-                InlineKeyboardButton("👥 All Sellers", callback_data="stats_all_sellers_menu")
-            ])
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        reply_markup = STATS_KEYBOARD_ALL if user_id == SUPER_ADMIN_ID else STATS_KEYBOARD_PERSONAL
         await query.edit_message_text("Please select a time period to view statistics:", reply_markup=reply_markup)
         return
 
     # 新增：管理员all sellers日期选择菜单
     if data == "stats_all_sellers_menu":
-        today = datetime.now().date()
         yesterday = today - timedelta(days=1)
         day_before_yesterday = today - timedelta(days=2)
-        start_of_week = today - timedelta(days=today.weekday())
-        start_of_month = today.replace(day=1)
         keyboard = [
             [
                 InlineKeyboardButton(f"{day_before_yesterday.strftime('%Y-%m-%d')}", callback_data=f"stats_all_sellers_{day_before_yesterday}"),
@@ -712,92 +698,128 @@ async def on_stats_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # 新增：管理员all sellers具体日期统计
     if data.startswith("stats_all_sellers_"):
         arg = data[len("stats_all_sellers_"):]
-        today = datetime.now().date()
-        start_of_week = today - timedelta(days=today.weekday())
-        start_of_month = today.replace(day=1)
-        if arg == "week":
-            await show_all_stats(query, start_of_week.strftime("%Y-%m-%d"), "This Week")
+        if arg in _PERIOD_LABELS:
+            await show_all_stats(query, date_range(arg, today), _PERIOD_LABELS[arg])
             return
-        elif arg == "month":
-            await show_all_stats(query, start_of_month.strftime("%Y-%m-%d"), "This Month")
-            return
-        else:
-            # 具体日期
-            await show_all_stats(query, arg, arg)
+        # 具体日期：即以该日期为"今天"的单日区间
+        try:
+            bounds = date_range('today', datetime.strptime(arg, "%Y-%m-%d").date())
+        except ValueError:
+            logger.warning(f"无效的统计日期: {arg}")
             return
-    
-    today = datetime.now().date()
+        await show_all_stats(query, bounds, arg)
+        return
     
     if data.startswith('stats_today'):
-        date_str = today.strftime("%Y-%m-%d")
         if data.endswith('_all'):
-            await show_all_stats(query, date_str, "Today")
+            await show_all_stats(query, date_range('today', today), "Today")
         else:
-            await show_personal_stats(query, user_id, date_str, "Today")
+            await show_personal_stats(query, user_id, date_range('today', today), "Today")
             
     elif data.startswith('stats_yesterday'):
-        yesterday = today - timedelta(days=1)
-        date_str = yesterday.strftime("%Y-%m-%d")
-        await show_personal_stats(query, user_id, date_str, "Yesterday")
+        await show_personal_stats(query, user_id, date_range('yesterday', today), "Yesterday")
         
     elif data.startswith('stats_week'):
-        # 计算本周开始和结束日期
-        start_of_week = today - timedelta(days=today.weekday())
-        end_of_week = today
-        await show_period_stats(query, user_id, start_of_week, end_of_week, "This Week")
+        # 本周一至今天
+        await show_period_stats(query, user_id, today - timedelta(days=today.weekday()), today, "This Week")
         
     elif data.startswith('stats_month'):
-        # 计算本月开始和结束日期
-        start_of_month = today.replace(day=1)
-        end_of_month = today
-        
         if data.endswith('_all'):
-            await show_all_stats(query, start_of_month.strftime("%Y-%m-%d"), "This Month")
+            await show_all_stats(query, date_range('month', today), "This Month")
         else:
-            await show_period_stats(query, user_id, start_of_month, end_of_month, "This Month")
+            # 本月1日至今天
+            await show_period_stats(query, user_id, today.replace(day=1), today, "This Month")
+
+# 统计消息中每个套餐一行的模板，各统计视图共用
+_STATS_PACKAGE_LINE = "{indent}{label}: {count} x ${price:.2f} = ${income:.2f}".format
+# 套餐 -> (英文名称, Telegram 价格)，统计循环中一次查表拿到两者；
+# 未知套餐回退为 (套餐代码, 0)，不会因缺少英文名称而中断整条统计消息
+PLAN_INFO = {
+    package: (PLAN_LABELS_EN.get(package, package), TG_PRICES.get(package, 0))
+    for package in TG_PRICES.keys() | PLAN_LABELS_EN.keys()
+}
+
+# Telegram 单条消息上限 4096 字符，统计消息留出余量
+_STATS_MESSAGE_LIMIT = 3950
+_STATS_TRUNCATED_NOTE = "...\n(Message truncated due to length limit)"
 
-async def show_personal_stats(query, user_id, date_str, period_text):
+def fit_stats_message(header, sections, footer):
+    """拼接统计消息；超过 Telegram 长度限制时只保留放得下的完整段落，头部和合计始终保留"""
+    budget = _STATS_MESSAGE_LIMIT - len(header) - len(footer)
+    kept = []
+    for section in sections:
+        budget -= len(section) + 2
+        if budget < len(_STATS_TRUNCATED_NOTE):
+            kept.append(_STATS_TRUNCATED_NOTE)
+            break
+        kept.append(section)
+    return header + "\n\n".join(kept) + "\n\n" + footer
+
+_PERIOD_LABELS = {'week': "This Week", 'month': "This Month"}
+
+@functools.lru_cache(maxsize=32)
+def date_range(kind, today):
+    """返回统计时间段的半开区间 (起始时间, 结束时间(不含))，用于可走索引的 completed_at 范围查询；
+    kind 为 today/yesterday/week/month，所有统计视图的日期区间都由这里计算"""
+    if kind == 'today':
+        start = end = today
+    elif kind == 'yesterday':
+        start = end = today - timedelta(days=1)
+    elif kind == 'week':
+        start, end = today - timedelta(days=today.weekday()), today
+    elif kind == 'month':
+        start, end = today.replace(day=1), today
+    else:
+        raise ValueError(f"未知的统计时间段: {kind}")
+    return f"{start} 00:00:00", f"{end + timedelta(days=1)} 00:00:00"
+
+# 个人单日统计消息的短时缓存：卖家反复点击 Today/Yesterday 时不重复查询，订单完成/失败时清空
+_personal_stats_cache = TTLDict(ttl=30, maxsize=1024)
+
+def invalidate_stats_caches():
+    """订单状态变化后清空统计缓存"""
+    _personal_stats_cache.clear()
+    _all_stats_cache.clear()
+
+async def show_personal_stats(query, user_id, bounds, period_text):
     """显示个人统计"""
-    # 查询指定日期完成的订单
-    completed_orders = execute_query("""
-        SELECT package FROM orders 
-        WHERE accepted_by = %s AND status = %s AND completed_at LIKE %s
-    """, (str(user_id), STATUS['COMPLETED'], f"{date_str}%"), fetch=True)
+    cache_key = (user_id, bounds, period_text)
+    message = _personal_stats_cache.get(cache_key)
+    if message is None:
+        message = await asyncio.to_thread(build_personal_stats_message, user_id, bounds, period_text)
+        _personal_stats_cache[cache_key] = message
     
-    # 统计各套餐数量
-    package_counts = {}
-    for order in completed_orders:
-        package = order[0]
-        package_counts[package] = package_counts.get(package, 0) + 1
+    await query.edit_message_text(message, reply_markup=STATS_BACK_MARKUP)
+
+def build_personal_stats_message(user_id, bounds, period_text):
+    """生成个人单日统计消息文本；bounds 为 date_range 返回的半开区间"""
+    # 按套餐在数据库中聚合该区间内完成的订单，只返回每个套餐一行
+    package_counts = execute_query("""
+        SELECT package, COUNT(*) FROM orders 
+        WHERE accepted_by = %s AND status = %s AND completed_at >= %s AND completed_at < %s
+        GROUP BY package ORDER BY package
+    """, (str(user_id), STATUS['COMPLETED'], *bounds), fetch=True) or []
     
     # 计算总收入
     total_income = 0
     order_count = 0
     stats_text = []
     
-    for package, count in package_counts.items():
-        price = TG_PRICES.get(package, 0)
+    for package, count in package_counts:
+        label, price = PLAN_INFO.get(package, (package, 0))
         income = price * count
-        stats_text.append(f"{PLAN_LABELS_EN[package]}: {count} x ${price:.2f} = ${income:.2f}")
+        stats_text.append(_STATS_PACKAGE_LINE(indent="", label=label, count=count, price=price, income=income))
         total_income += income
         order_count += count
     
-    # 发送统计消息
     if stats_text:
-        message = (
+        return (
             f"📊 Your Statistics ({period_text}):\n\n"
             + "\n".join(stats_text) + "\n\n"
             f"Total Orders: {order_count}\n"
             f"Total Earnings: ${total_income:.2f}"
         )
-    else:
-        message = f"No completed orders found for {period_text}."
-    
-    # 添加返回按钮
-    keyboard = [[InlineKeyboardButton("⬅️ Back", callback_data="stats_back")]]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    
-    await query.edit_message_text(message, reply_markup=reply_markup)
+    return f"No completed orders found for {period_text}."
 
 async def show_period_stats(query, user_id, start_date, end_date, period_text):
     """显示时间段统计"""
@@ -805,186 +827,208 @@ async def show_period_stats(query, user_id, start_date, end_date, period_text):
     start_str = start_date.strftime("%Y-%m-%d")
     end_str = end_date.strftime("%Y-%m-%d")
     
-    # 获取该时间段内用户完成的所有订单
-    orders = execute_query("""
-        SELECT package, completed_at FROM orders 
+    # 按日期和套餐在数据库中聚合该时间段内用户完成的订单
+    rows = await asyncio.to_thread(execute_query, """
+        SELECT substr(completed_at, 1, 10) AS day, package, COUNT(*) FROM orders 
         WHERE accepted_by = %s AND status = %s 
-        AND completed_at >= %s AND completed_at <= %s
+        AND completed_at >= %s AND completed_at < %s
+        GROUP BY day, package
+        ORDER BY day, package
     """, (
         str(user_id), STATUS['COMPLETED'], 
-        f"{start_str} 00:00:00", f"{end_str} 23:59:59"
-    ), fetch=True)
-    
-    # 按日期和套餐统计
-    daily_stats = {}
-    package_counts = {}
-    
-    for package, completed_at in orders:
-        # 提取日期部分
-        date = completed_at.split()[0]
-        
-        # 更新每日统计
-        if date not in daily_stats:
-            daily_stats[date] = {}
-        
-        if package not in daily_stats[date]:
-            daily_stats[date][package] = 0
-        
-        daily_stats[date][package] += 1
-        
-        # 更新总计统计
-        if package not in package_counts:
-            package_counts[package] = 0
-        
-        package_counts[package] += 1
+        date_range('today', start_date)[0], date_range('today', end_date)[1]
+    ), fetch=True) or []
     
-    # 计算总收入和订单数
-    total_income = 0
-    order_count = 0
-    
-    # 生成消息
-    if daily_stats:
-        # 首先按日期排序
-        sorted_dates = sorted(daily_stats.keys())
-        
-        # 生成每日统计
+    if not rows:
+        message = f"No completed orders found for {period_text} ({start_str} to {end_str})."
+    else:
+        # 一次遍历按日期分组生成每日段落，同时累计套餐总数
         daily_messages = []
-        for date in sorted_dates:
+        package_counts = {}
+        for date, day_rows in itertools.groupby(rows, key=operator.itemgetter(0)):
             day_income = 0
             day_count = 0
             day_details = []
-            
-            for package, count in daily_stats[date].items():
-                price = TG_PRICES.get(package, 0)
+            for _, package, count in day_rows:
+                label, price = PLAN_INFO.get(package, (package, 0))
                 income = price * count
                 day_income += income
                 day_count += count
-                day_details.append(f"  {PLAN_LABELS_EN[package]}: {count} x ${price:.2f} = ${income:.2f}")
-            
+                package_counts[package] = package_counts.get(package, 0) + count
+                day_details.append(_STATS_PACKAGE_LINE(indent="  ", label=label, count=count, price=price, income=income))
             daily_messages.append(
                 f"📅 {date}: {day_count} orders, ${day_income:.2f}\n" +
                 "\n".join(day_details)
             )
         
         # 生成总计统计
+        total_income = 0
+        order_count = 0
         summary_lines = []
         for package, count in package_counts.items():
-            price = TG_PRICES.get(package, 0)
+            label, price = PLAN_INFO.get(package, (package, 0))
             income = price * count
             total_income += income
             order_count += count
-            summary_lines.append(f"{PLAN_LABELS_EN[package]}: {count} x ${price:.2f} = ${income:.2f}")
+            summary_lines.append(_STATS_PACKAGE_LINE(indent="", label=label, count=count, price=price, income=income))
         
-        # 组合消息
-        message = (
-            f"📊 {period_text} Statistics ({start_str} to {end_str}):\n\n"
-            + "\n\n".join(daily_messages) + "\n\n"
-            + "📈 Summary:\n"
+        header = f"📊 {period_text} Statistics ({start_str} to {end_str}):\n\n"
+        footer = (
+            "📈 Summary:\n"
             + "\n".join(summary_lines) + "\n\n"
             f"Total Orders: {order_count}\n"
             f"Total Earnings: ${total_income:.2f}"
         )
-    else:
-        message = f"No completed orders found for {period_text} ({start_str} to {end_str})."
+        message = fit_stats_message(header, daily_messages, footer)
     
-    # 消息可能很长，需要检查长度
-    if len(message) > 4000:
-        message = message[:3950] + "\n...\n(Message truncated due to length limit)"
-    
-    # 添加返回按钮
-    keyboard = [[InlineKeyboardButton("⬅️ Back", callback_data="stats_back")]]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    
-    await query.edit_message_text(message, reply_markup=reply_markup)
+    await query.edit_message_text(message, reply_markup=STATS_BACK_MARKUP)
+
+# 全体统计消息的短时缓存：管理员反复刷新时合并为一次查询，订单完成/失败时清空
+_all_stats_cache = TTLDict(ttl=5, maxsize=64)
+# 每个缓存键一把锁：不同时间段的统计互不等待；键在重建完成后移除，字典只保存正在重建的键
+_all_stats_locks = defaultdict(asyncio.Lock)
 
-async def show_all_stats(query, date_str, period_text):
+async def show_all_stats(query, bounds, period_text):
     """显示所有人的统计信息"""
     # 检查是否是超级管理员
     user_id = query.from_user.id
-    if user_id != 1878943383:
+    if user_id != SUPER_ADMIN_ID:
         await query.answer("You don't have permission to view all sellers' statistics", show_alert=True)
         return
-        
-    # 查询指定日期所有完成的订单
-    if len(date_str) == 10:  # 单日格式 YYYY-MM-DD
-        completed_orders = execute_query("""
-            SELECT accepted_by, package FROM orders 
-            WHERE status = %s AND completed_at LIKE %s
-        """, (STATUS['COMPLETED'], f"{date_str}%"), fetch=True)
-    else:  # 时间段
-        start_str = date_str
-        completed_orders = execute_query("""
-            SELECT accepted_by, package FROM orders 
-            WHERE status = %s AND completed_at >= %s
-        """, (STATUS['COMPLETED'], f"{start_str} 00:00:00"), fetch=True)
-    
-    # 按用户统计
-    user_stats = {}
-    for accepted_by, package in completed_orders:
-        if accepted_by not in user_stats:
-            user_stats[accepted_by] = {}
-        
-        if package not in user_stats[accepted_by]:
-            user_stats[accepted_by][package] = 0
-            
-        user_stats[accepted_by][package] += 1
-    
-    # 生成消息
-    if user_stats:
-        all_user_messages = []
-        total_all_income = 0
-        total_all_orders = 0
-        
-        for user_id, packages in user_stats.items():
-            # 获取用户名
+
+    cache_key = (bounds, period_text)
+    message = _all_stats_cache.get(cache_key)
+    if message is None:
+        # 同一个键同一时刻只允许一个协程重建，其余等待后直接命中缓存
+        lock = _all_stats_locks[cache_key]
+        async with lock:
             try:
-                user_info = await get_user_info(int(user_id))
-                user_name = f"@{user_info['username']}" if user_info['username'] != 'No_Username' else user_info['first_name']
-            except:
-                user_name = f"User {user_id}"
-            
-            # 统计该用户的订单
-            user_income = 0
-            user_orders = 0
-            user_details = []
-            
-            for package, count in packages.items():
-                price = TG_PRICES.get(package, 0)
-                income = price * count
-                user_income += income
-                user_orders += count
-                user_details.append(f"  {PLAN_LABELS_EN[package]}: {count} x ${price:.2f} = ${income:.2f}")
-            
-            all_user_messages.append(
-                f"👤 {user_name}: {user_orders} orders, ${user_income:.2f}\n" +
-                "\n".join(user_details)
-            )
-            
-            total_all_income += user_income
-            total_all_orders += user_orders
+                message = _all_stats_cache.get(cache_key)
+                if message is None:
+                    message = await build_all_stats_message(bounds, period_text)
+                    _all_stats_cache[cache_key] = message
+            finally:
+                if _all_stats_locks.get(cache_key) is lock:
+                    del _all_stats_locks[cache_key]
+    
+    await query.edit_message_text(message, reply_markup=STATS_BACK_MARKUP)
+
+async def stats_display_name(user_id, username=None):
+    """统计中展示的卖家名称；优先使用卖家表中登记的用户名，查询失败时回退为 User <id>"""
+    if username and not username.startswith('env_seller_'):
+        return f"@{username.lstrip('@')}"
+    try:
+        user_info = await get_user_info(int(user_id))
+        return f"@{user_info['username']}" if user_info['username'] != 'No_Username' else user_info['first_name']
+    except Exception:
+        return f"User {user_id}"
+
+async def build_all_stats_message(bounds, period_text):
+    """生成全体卖家统计消息文本；bounds 为 completed_at 的半开区间 (起始, 结束(不含))"""
+    # 一次查询同时拿到每个卖家各套餐的完成数量和卖家表中的用户名，按卖家排序以便逐组生成
+    rows = await asyncio.to_thread(execute_query, """
+        WITH counts AS (
+            SELECT accepted_by, package, COUNT(*) AS n FROM orders
+            WHERE status = %s AND completed_at >= %s AND completed_at < %s
+            GROUP BY package, accepted_by
+        )
+        SELECT c.accepted_by, c.package, c.n, s.username
+        FROM counts c
+        LEFT JOIN sellers s ON s.telegram_id::text = c.accepted_by
+        ORDER BY c.accepted_by, c.package
+    """, (STATUS['COMPLETED'], *bounds), fetch=True) or []
+    
+    if not rows:
+        return f"No completed orders found for {period_text}."
+    
+    sellers = [(user_id, list(group)) for user_id, group in itertools.groupby(rows, key=operator.itemgetter(0))]
+    
+    # 卖家表缺少用户名时才查询 Telegram，且并发进行而不是在循环里逐个等待
+    user_names = await asyncio.gather(*(
+        _send_limited(stats_display_name(user_id, group[0][3])) for user_id, group in sellers
+    ))
+    
+    all_user_messages = []
+    total_all_income = 0
+    total_all_orders = 0
+    for (user_id, group), user_name in zip(sellers, user_names):
+        # 统计该用户的订单
+        user_income = 0
+        user_orders = 0
+        user_details = []
+        
+        for _, package, count, _ in group:
+            label, price = PLAN_INFO.get(package, (package, 0))
+            income = price * count
+            user_income += income
+            user_orders += count
+            user_details.append(_STATS_PACKAGE_LINE(indent="  ", label=label, count=count, price=price, income=income))
         
-        # 组合消息
-        message = (
-            f"📊 All Staff Statistics ({period_text}):\n\n"
-            + "\n\n".join(all_user_messages) + "\n\n"
-            f"Total Staff: {len(user_stats)}\n"
-            f"Total Orders: {total_all_orders}\n"
-            f"Total Revenue: ${total_all_income:.2f}"
+        all_user_messages.append(
+            f"👤 {user_name}: {user_orders} orders, ${user_income:.2f}\n" +
+            "\n".join(user_details)
         )
-    else:
-        message = f"No completed orders found for {period_text}."
-    
-    # 检查消息长度
-    if len(message) > 4000:
-        message = message[:3950] + "\n...\n(Message truncated due to length limit)"
-    
-    # 添加返回按钮
-    keyboard = [[InlineKeyboardButton("⬅️ Back", callback_data="stats_back")]]
-    reply_markup = InlineKeyboardMarkup(keyboard)
+        
+        total_all_income += user_income
+        total_all_orders += user_orders
     
-    await query.edit_message_text(message, reply_markup=reply_markup)
+    return fit_stats_message(
+        f"📊 All Staff Statistics ({period_text}):\n\n",
+        all_user_messages,
+        f"Total Staff: {len(sellers)}\n"
+        f"Total Orders: {total_all_orders}\n"
+        f"Total Revenue: ${total_all_income:.2f}"
+    )
 
 # ===== 推送通知 =====
+# 并发推送/查询时限制同时在途的请求数，避免超过 Telegram 每秒约 30 条的全局限制
+_send_semaphore = asyncio.Semaphore(25)
+
+async def _send_limited(coro):
+    """在并发上限内执行一次 Telegram 请求"""
+    async with _send_semaphore:
+        return await coro
+
+def accept_order_markup(oid):
+    """新订单推送的接单按钮；直接使用 Bot API 的字典结构，PTB 会原样序列化。每次返回新字典，不做缓存"""
+    return {'inline_keyboard': [[{'text': 'Accept', 'callback_data': f'accept_{oid}'}]]}
+
+def dispute_order_markup(oid):
+    """质疑订单推送的 完成/失败 按钮；与 accept_order_markup 一样直接使用字典结构"""
+    return {'inline_keyboard': [[
+        {'text': '✅ Complete', 'callback_data': f'done_{oid}'},
+        {'text': '❌ Failed', 'callback_data': f'fail_{oid}'},
+    ]]}
+
+async def _broadcast_new_order(oid, account, package, seller_ids):
+    """向所有卖家并发推送新订单通知（受 _send_semaphore 限流），返回成功送达的卖家数"""
+    logger.info(f"准备推送订单 #{oid} 给卖家")
+    message = (
+        f"📦 New Order #{oid}\n"
+        f"Account: `{account}`\n"
+        f"Package: {package} month(s)"
+    )
+    reply_markup = accept_order_markup(oid)
+    
+    results = await asyncio.gather(*(
+        _send_limited(bot_application.bot.send_message(
+            chat_id=seller_id,
+            text=message,
+            reply_markup=reply_markup,
+            parse_mode='Markdown'
+        ))
+        for seller_id in seller_ids
+    ), return_exceptions=True)
+
+    success_count = 0
+    for seller_id, result in zip(seller_ids, results):
+        if isinstance(result, BaseException):
+            logger.error(f"向卖家 {seller_id} 发送订单 #{oid} 通知失败: {str(result)}", exc_info=result)
+        else:
+            success_count += 1
+            logger.info(f"成功向卖家 {seller_id} 推送订单 #{oid}, 消息ID: {result.message_id}")
+    return success_count
+
 async def check_and_push_orders():
     """检查并推送新订单"""
     global bot_application
@@ -996,8 +1040,8 @@ async def check_and_push_orders():
         
         # 获取未通知的订单
         try:
-            unnotified_orders = get_unnotified_orders()
-            logger.debug(f"检索到 {len(unnotified_orders) if unnotified_orders else 0} 个未通知的订单")
+            unnotified_orders = await asyncio.to_thread(get_unnotified_orders)
+            logger.debug("检索到 %d 个未通知的订单", len(unnotified_orders or ()))
         except Exception as db_error:
             logger.error(f"获取未通知订单时出错: {str(db_error)}", exc_info=True)
             return
@@ -1008,8 +1052,8 @@ async def check_and_push_orders():
         
         # 获取活跃卖家
         try:
-            seller_ids = get_active_seller_ids()
-            logger.debug(f"检索到 {len(seller_ids) if seller_ids else 0} 个活跃卖家")
+            seller_ids = await asyncio.to_thread(get_active_seller_ids)
+            logger.debug("检索到 %d 个活跃卖家", len(seller_ids or ()))
         except Exception as seller_error:
             logger.error(f"获取活跃卖家时出错: {str(seller_error)}", exc_info=True)
             return
@@ -1020,60 +1064,41 @@ async def check_and_push_orders():
         
         logger.info(f"找到 {len(seller_ids)} 个活跃卖家")
         
-        for order in unnotified_orders:
+        async def push_order(order):
+            """向所有卖家推送一个订单；至少一个卖家收到时返回订单ID"""
             try:
                 if len(order) < 6:
                     logger.error(f"订单数据格式错误: {order}")
-                    continue
+                    return None
                     
                 oid, account, password, package, created_at, web_user_id = order
-                
-                logger.info(f"准备推送订单 #{oid} 给卖家")
-                
-                # 验证订单是否真实存在
-                if not check_order_exists(oid):
-                    logger.error(f"订单 #{oid} 不存在于数据库中，但出现在未通知列表中")
-                    continue
-                
-                message = (
-                    f"📦 New Order #{oid}\n"
-                    f"Account: `{account}`\n"
-                    f"Package: {package} month(s)"
-                )
-                
-                # 创建接单按钮 - 确保callback_data格式正确
-                callback_data = f'accept_{oid}'
-                logger.info(f"创建接单按钮，callback_data: {callback_data}")
-                
-                keyboard = [[InlineKeyboardButton("Accept", callback_data=callback_data)]]
-                reply_markup = InlineKeyboardMarkup(keyboard)
-                
-                # 向所有卖家发送通知
-                success_count = 0
-                for seller_id in seller_ids:
-                    try:
-                        sent_message = await bot_application.bot.send_message(
-                            chat_id=seller_id, 
-                            text=message, 
-                            reply_markup=reply_markup,
-                            parse_mode='Markdown'
-                        )
-                        success_count += 1
-                        logger.info(f"成功向卖家 {seller_id} 推送订单 #{oid}, 消息ID: {sent_message.message_id}")
-                    except Exception as e:
-                        logger.error(f"向卖家 {seller_id} 发送订单 #{oid} 通知失败: {str(e)}", exc_info=True)
+                success_count = await _broadcast_new_order(oid, account, package, seller_ids)
                 
                 if success_count > 0:
-                    # 只有成功推送给至少一个卖家时才标记为已通知
-                    try:
-                        execute_query("UPDATE orders SET notified = 1 WHERE id = %s", (oid,))
-                        logger.info(f"订单 #{oid} 已成功推送给 {success_count}/{len(seller_ids)} 个卖家")
-                    except Exception as update_error:
-                        logger.error(f"更新订单 #{oid} 通知状态时出错: {str(update_error)}", exc_info=True)
-                else:
-                    logger.error(f"订单 #{oid} 未能成功推送给任何卖家")
+                    logger.info(f"订单 #{oid} 已成功推送给 {success_count}/{len(seller_ids)} 个卖家")
+                    return oid
+                logger.error(f"订单 #{oid} 未能成功推送给任何卖家")
             except Exception as e:
                 logger.error(f"处理订单通知时出错: {str(e)}", exc_info=True)
+            return None
+
+        # 推送前一次性认领：只有未通知（或认领已超时）的订单才由本轮推送，
+        # 与通知队列路径（set_order_notified_atomic）互斥，同一订单不会被发送两次
+        claimed = await asyncio.to_thread(
+            execute_query, SQL_CLAIM_NOTIFY_MANY, ([order[0] for order in unnotified_orders],), fetch=True) or []
+        claimed_ids = {row[0] for row in claimed}
+        orders_to_push = [order for order in unnotified_orders if order[0] in claimed_ids]
+        if not orders_to_push:
+            return
+
+        delivered_ids = []
+        try:
+            # 多个未通知订单也并发推送；总发送量仍由 _send_semaphore 限制
+            pushed = await asyncio.gather(*(push_order(order) for order in orders_to_push))
+            delivered_ids = [oid for oid in pushed if oid is not None]
+        finally:
+            # 无论正常结束、出错还是被取消，都结算全部认领：一个卖家都没送达的撤销认领，下一轮再试
+            await _settle_notify_claims(claimed_ids, delivered_ids)
     except Exception as e:
         logger.error(f"检查并推送订单时出错: {str(e)}", exc_info=True)
 
@@ -1101,23 +1126,30 @@ async def send_notification_from_queue(data):
         logger.error(f"发送通知时出错: {str(e)}", exc_info=True)
 
 # ===== 推送通知函数 =====
+async def _settle_notify_claims(claimed_ids, delivered_ids):
+    """推送结束后结算认领：已送达的确认，其余撤销；失败时保留认领，超时后由兜底轮询重新认领"""
+    delivered = set(delivered_ids)
+    failed_ids = [oid for oid in claimed_ids if oid not in delivered]
+    try:
+        if delivered:
+            await asyncio.to_thread(execute_query, SQL_CONFIRM_NOTIFY_MANY, (list(delivered),))
+        if failed_ids:
+            await asyncio.to_thread(execute_query, SQL_RELEASE_NOTIFY_MANY, (failed_ids,))
+    except Exception as update_error:
+        logger.error(f"结算订单通知认领时出错: {str(update_error)}", exc_info=True)
+
 def set_order_notified_atomic(oid):
-    """原子性地将订单 notified 字段设为 1，只有 notified=0 时才更新，防止重复推送。"""
-    conn = get_db_connection()
-    if not conn:
-        return False
+    """原子性地认领订单推送（notified 设为 1），只有未通知或认领已超时时才更新，防止重复推送。"""
     try:
-        cursor = conn.cursor()
-        cursor.execute("UPDATE orders SET notified=1 WHERE id=%s AND notified=0", (oid,))
-        affected = cursor.rowcount
-        conn.commit()
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(SQL_CLAIM_NOTIFY_MANY, ([oid],))
+            affected = cursor.rowcount
+            conn.commit()
         return affected > 0
     except Exception as e:
-        conn.rollback()
         logger.error(f"原子标记订单 #{oid} 通知状态时出错: {e}", exc_info=True)
         return False
-    finally:
-        conn.close()
 
 async def send_new_order_notification(data):
     """发送新订单通知到所有卖家"""
@@ -1127,54 +1159,25 @@ async def send_new_order_notification(data):
         # 获取新订单详情
         oid = data.get('order_id')
         # 推送前先原子性标记
-        if not set_order_notified_atomic(oid):
+        if not await asyncio.to_thread(set_order_notified_atomic, oid):
             logger.info(f"订单 #{oid} 已经被其他进程推送过，跳过")
             return
-        account = data.get('account')
-        password = data.get('password')
-        package = data.get('package')
-        
-        # 构建消息文本
-        message_text = (
-            f"📦 New Order #{oid}\n"
-            f"Account: `{account}`\n"
-            f"Package: {package} month(s)"
-        )
-        
-        # 创建接单按钮
-        callback_data = f'accept_{oid}'
-        keyboard = [[InlineKeyboardButton("Accept", callback_data=callback_data)]]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        # 向所有卖家发送通知
-        seller_ids = get_active_seller_ids()
-        if not seller_ids:
-            logger.warning("没有活跃的卖家，无法推送订单")
-            return
+        delivered_ids = []
+        try:
+            seller_ids = await asyncio.to_thread(get_active_seller_ids)
+            if not seller_ids:
+                logger.warning("没有活跃的卖家，无法推送订单")
+                return
             
-        success_count = 0
-        for seller_id in seller_ids:
-            try:
-                sent_message = await bot_application.bot.send_message(
-                    chat_id=seller_id, 
-                    text=message_text, 
-                    reply_markup=reply_markup,
-                    parse_mode='Markdown'
-                )
-                success_count += 1
-                logger.info(f"成功向卖家 {seller_id} 推送订单 #{oid}, 消息ID: {sent_message.message_id}")
-            except Exception as e:
-                logger.error(f"向卖家 {seller_id} 发送订单 #{oid} 通知失败: {str(e)}", exc_info=True)
-        
-        if success_count > 0:
-            # 标记订单为已通知
-            try:
-                execute_query("UPDATE orders SET notified = 1 WHERE id = %s", (oid,))
+            success_count = await _broadcast_new_order(oid, data.get('account'), data.get('package'), seller_ids)
+            if success_count > 0:
+                delivered_ids.append(oid)
                 logger.info(f"订单 #{oid} 已成功推送给 {success_count}/{len(seller_ids)} 个卖家")
-            except Exception as update_error:
-                logger.error(f"更新订单 #{oid} 通知状态时出错: {str(update_error)}", exc_info=True)
-        else:
-            logger.error(f"订单 #{oid} 未能成功推送给任何卖家")
+            else:
+                logger.error(f"订单 #{oid} 未能成功推送给任何卖家")
+        finally:
+            # 一个卖家都没送达（含出错、被取消）：撤销认领，交给兜底轮询重试
+            await _settle_notify_claims([oid], delivered_ids)
     except Exception as e:
         logger.error(f"发送新订单通知时出错: {str(e)}", exc_info=True)
 
@@ -1183,8 +1186,7 @@ async def send_status_change_notification(data):
     global bot_application
     
     try:
-        # 超级管理员的Telegram ID
-        admin_id = 1878943383
+        admin_id = SUPER_ADMIN_ID
         
         # 获取订单状态变更详情
         oid = data.get('order_id')
@@ -1226,8 +1228,7 @@ async def send_recharge_request_notification(data):
     global bot_application
     
     try:
-        # 超级管理员的Telegram ID
-        admin_id = 1878943383
+        admin_id = SUPER_ADMIN_ID
         
         # 获取充值请求详情
         request_id = data.get('request_id')
@@ -1278,15 +1279,14 @@ async def send_recharge_request_notification(data):
                 
                 if os.path.exists(local_image_path):
                     try:
-                        # 直接发送图片文件
-                        with open(local_image_path, 'rb') as photo_file:
-                            await bot_application.bot.send_photo(
-                                chat_id=admin_id,
-                                photo=photo_file,
-                                caption=message_text,
-                                reply_markup=reply_markup,
-                                parse_mode='HTML'
-                            )
+                        # 首次上传后复用 file_id；图片字节在线程池中读取，不阻塞事件循环
+                        await send_photo_cached(
+                            admin_id,
+                            local_image_path,
+                            caption=message_text,
+                            reply_markup=reply_markup,
+                            parse_mode='HTML'
+                        )
                         logger.info(f"已成功发送充值请求图片通知到管理员 {admin_id}")
                     except Exception as img_send_error:
                         logger.error(f"发送本地图片失败: {img_send_error}, 回退到纯文本通知", exc_info=True)
@@ -1339,13 +1339,7 @@ async def send_dispute_notification(data):
         )
         
         # 添加反馈按钮
-        keyboard = [
-            [
-                InlineKeyboardButton("✅ Complete", callback_data=f"done_{oid}"),
-                InlineKeyboardButton("❌ Failed", callback_data=f"fail_{oid}")
-            ]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        reply_markup = dispute_order_markup(oid)
         
         await bot_application.bot.send_message(
             chat_id=seller_id,
@@ -1360,13 +1354,30 @@ async def send_dispute_notification(data):
 # ===== 主函数 =====
 def run_bot(notification_queue):
     """在一个新事件循环中运行Telegram机器人"""
-    global BOT_LOOP
-    loop = asyncio.new_event_loop()
+    global BOT_LOOP, _shutdown_event
+    loop = uvloop.new_event_loop() if uvloop else asyncio.new_event_loop()
     asyncio.set_event_loop(loop)
+    # 事件必须在设置好本线程的事件循环之后创建（Python 3.9 的 asyncio.Event 会在构造时绑定循环）
+    _shutdown_event = asyncio.Event()
     BOT_LOOP = loop  # 保存主事件循环
+
+    # 信号处理器只能在主线程注册；在后台线程运行时由 app.py 调用 stop_bot()
+    if threading.current_thread() is threading.main_thread():
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            try:
+                loop.add_signal_handler(sig, _shutdown_event.set)
+            except (NotImplementedError, RuntimeError):
+                pass
+
     loop.run_until_complete(bot_main(notification_queue))
 
 
+def stop_bot():
+    """请求机器人优雅退出（线程安全）"""
+    if BOT_LOOP and _shutdown_event and not BOT_LOOP.is_closed():
+        BOT_LOOP.call_soon_threadsafe(_shutdown_event.set)
+
+
 async def bot_main(notification_queue):
     """机器人的主异步函数"""
     global bot_application
@@ -1383,6 +1394,8 @@ async def bot_main(notification_queue):
             .read_timeout(30.0)
             .write_timeout(30.0)
             .pool_timeout(30.0)
+            # 更新之间并发处理，保持与逐条 process_update 时相同的并发行为
+            .concurrent_updates(True)
             .build()
         )
         
@@ -1391,7 +1404,8 @@ async def bot_main(notification_queue):
         # 添加处理程序
         bot_application.add_handler(CommandHandler("start", on_start))
         bot_application.add_handler(CommandHandler("seller", on_admin_command))
-        bot_application.add_handler(CommandHandler("stats", on_stats))
+        # 统计相关处理较重，block=False 让其在后台运行，不阻塞后续更新的分发
+        bot_application.add_handler(CommandHandler("stats", on_stats, block=False))
         
         # 添加测试命令处理程序
         bot_application.add_handler(CommandHandler("test", on_test))
@@ -1403,7 +1417,7 @@ async def bot_main(notification_queue):
         feedback_handler = CallbackQueryHandler(on_feedback_button, pattern="^(done|fail|reason)_")
         bot_application.add_handler(feedback_handler)
         
-        stats_handler = CallbackQueryHandler(on_stats_callback, pattern="^stats_")
+        stats_handler = CallbackQueryHandler(on_stats_callback, pattern="^stats_", block=False)
         bot_application.add_handler(stats_handler)
         
         # 添加充值请求回调处理程序
@@ -1421,6 +1435,8 @@ async def bot_main(notification_queue):
         # 初始化应用
         logger.info("初始化Telegram应用...")
         await bot_application.initialize()
+        # 启动更新队列的分发任务，webhook 收到的更新经由 update_queue 处理
+        await bot_application.start()
         
         # 获取Railway应用URL
         railway_url = os.environ.get('RAILWAY_STATIC_URL')
@@ -1449,12 +1465,20 @@ async def bot_main(notification_queue):
         
         logger.info("Telegram机器人主循环已启动，等待更新...")
         
-        # 保持此协程运行以使后台任务可以执行
-        while True:
-            await asyncio.sleep(3600) # 每小时唤醒一次，但主要目的是保持运行
+        # 保持此协程运行，直到收到关闭信号
+        await _shutdown_event.wait()
+        logger.info("收到关闭信号，正在关闭Telegram机器人...")
 
     except Exception as e:
         logger.critical(f"Telegram机器人主函数 `bot_main` 发生严重错误: {str(e)}", exc_info=True)
+    finally:
+        if bot_application:
+            try:
+                if bot_application.running:
+                    await bot_application.stop()
+                await bot_application.shutdown()
+            except Exception as e:
+                logger.error(f"关闭Telegram应用时出错: {str(e)}", exc_info=True)
 
 # 添加错误处理函数
 async def error_handler(update, context):
@@ -1475,31 +1499,53 @@ async def error_handler(update, context):
     except Exception as e:
         logger.error(f"尝试回复错误通知失败: {str(e)}")
 
+# 新订单由 Web 端写入通知队列后立即推送；轮询只作为兜底（队列丢失、进程重启等）
+ORDER_CHECK_INTERVAL = 60
+
 async def periodic_order_check():
-    """定期检查新订单的任务"""
+    """定期检查遗漏推送的新订单（兜底任务）"""
     check_count = 0
     while True:
         try:
-            logger.debug(f"执行第 {check_count + 1} 次订单检查")
+            logger.debug("执行第 %d 次订单检查", check_count + 1)
             await check_and_push_orders()
-            await cleanup_processing_accepts()
             check_count += 1
         except Exception as e:
             logger.error(f"订单检查任务出错: {e}", exc_info=True)
         
-        await asyncio.sleep(5) # 每5秒检查一次
+        await asyncio.sleep(ORDER_CHECK_INTERVAL)
+
+
+def _bridge_notification_queue(queue, loop, aio_queue):
+    """常驻线程：把 Flask 线程安全队列中的任务转交到事件循环内的 asyncio.Queue"""
+    while True:
+        item = queue.get()
+        try:
+            loop.call_soon_threadsafe(aio_queue.put_nowait, item)
+        except RuntimeError:
+            # 事件循环已关闭
+            logger.info("机器人事件循环已关闭，通知桥接线程退出。")
+            break
+        finally:
+            queue.task_done()
 
 
 async def process_notification_queue(queue):
     """处理来自Flask的通知队列"""
-    loop = asyncio.get_running_loop()
+    aio_queue = asyncio.Queue()
+    threading.Thread(
+        target=_bridge_notification_queue,
+        args=(queue, asyncio.get_running_loop(), aio_queue),
+        name="notification-bridge",
+        daemon=True
+    ).start()
+
     while True:
         try:
-            # 在执行器中运行阻塞的 queue.get()，这样不会阻塞事件循环
-            data = await loop.run_in_executor(None, queue.get)
+            data = await aio_queue.get()
             logger.info(f"从队列中获取到通知任务: {data.get('type')}")
             await send_notification_from_queue(data)
-            queue.task_done()
+            aio_queue.task_done()
         except asyncio.CancelledError:
             logger.info("通知队列处理器被取消。")
             break
@@ -1514,79 +1560,13 @@ def restricted(func):
     @wraps(func)
     async def wrapped(update, context, *args, **kwargs):
         user_id = update.effective_user.id
-        if not is_seller(user_id):
+        if not await is_seller(user_id):
             logger.warning(f"未经授权的访问: {user_id}")
             await update.message.reply_text("Sorry, you are not authorized to use this bot.")
             return
         return await func(update, context, *args, **kwargs)
     return wrapped
 
-def get_order_by_id(order_id):
-    """根据ID获取订单信息（返回字典）"""
-    try:
-        conn = get_db_connection()
-        if not conn:
-            logger.error(f"获取订单 {order_id} 信息时无法获取数据库连接")
-            return None
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM orders WHERE id = %s", (order_id,))
-        order = cursor.fetchone()
-        columns = [desc[0] for desc in cursor.description] if cursor.description else []
-        conn.close()
-        if order:
-            return dict(zip(columns, order))
-        return None
-    except Exception as e:
-        logger.error(f"获取订单 {order_id} 信息时出错: {str(e)}", exc_info=True)
-        return None
-
-def check_order_exists(order_id):
-    """检查数据库中是否存在指定ID的订单"""
-    try:
-        result = execute_query("SELECT COUNT(*) FROM orders WHERE id = %s", (order_id,), fetch=True)
-        count = result[0][0] if result else 0
-        if count == 0:
-            logger.warning(f"订单 {order_id} 在数据库中不存在")
-        return count > 0
-    except Exception as e:
-        logger.error(f"检查订单 {order_id} 是否存在时出错: {str(e)}", exc_info=True)
-        return False
-
-def update_order_status(order_id, status, handler_id=None):
-    """更新订单状态"""
-    try:
-        conn = get_db_connection()
-        if not conn:
-            logger.error(f"更新订单 {order_id} 状态时无法获取数据库连接")
-            return False
-            
-        cursor = conn.cursor()
-        
-        if handler_id:
-            cursor.execute(
-                "UPDATE orders SET status = %s, handler_id = %s, updated_at = NOW() WHERE id = %s",
-                (status, handler_id, order_id)
-            )
-        else:
-            cursor.execute(
-                "UPDATE orders SET status = %s, updated_at = NOW() WHERE id = %s",
-                (status, order_id)
-            )
-        
-        conn.commit()
-        conn.close()
-        
-        logger.info(f"已更新订单 {order_id} 状态为 {status}")
-        return True
-    except Exception as e:
-        try:
-            conn.rollback()
-            conn.close()
-        except Exception:
-            pass
-        logger.error(f"更新订单 {order_id} 状态时出错: {str(e)}", exc_info=True)
-        return False 
-
 @callback_error_handler
 async def on_callback_query(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """处理回调查询"""
@@ -1617,7 +1597,7 @@ async def on_approve_recharge(update: Update, context: ContextTypes.DEFAULT_TYPE
     user_id = update.effective_user.id
     
     # 只允许超级管理员处理充值请求
-    if user_id != 1878943383:
+    if user_id != SUPER_ADMIN_ID:
         await query.answer("您没有权限执行此操作", show_alert=True)
         return
     
@@ -1625,7 +1605,7 @@ async def on_approve_recharge(update: Update, context: ContextTypes.DEFAULT_TYPE
     request_id = int(query.data.split(":")[1])
     
     # 批准充值请求
-    success, message = approve_recharge_request(request_id, str(user_id))
+    success, message = await asyncio.to_thread(approve_recharge_request, request_id, str(user_id))
     
     if success:
         # 更新消息
@@ -1648,7 +1628,7 @@ async def on_reject_recharge(update: Update, context: ContextTypes.DEFAULT_TYPE)
     user_id = update.effective_user.id
     
     # 只允许超级管理员处理充值请求
-    if user_id != 1878943383:
+    if user_id != SUPER_ADMIN_ID:
         await query.answer("您没有权限执行此操作", show_alert=True)
         return
     
@@ -1656,7 +1636,7 @@ async def on_reject_recharge(update: Update, context: ContextTypes.DEFAULT_TYPE)
     request_id = int(query.data.split(":")[1])
     
     # 拒绝充值请求
-    success, message = reject_recharge_request(request_id, str(user_id))
+    success, message = await asyncio.to_thread(reject_recharge_request, request_id, str(user_id))
     
     if success:
         # 更新消息
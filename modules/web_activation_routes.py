@@ -90,8 +90,7 @@ def register_activation_routes(app, admin_required):
             query = f"DELETE FROM activation_codes WHERE id IN ({placeholders}) AND is_used = 0"
 
             # 执行删除
-            result = execute_query(query, code_ids_int, return_cursor=True)
-            deleted_count = result.rowcount if result else 0
+            deleted_count = execute_query(query, code_ids_int, return_rowcount=True)
 
             logger.info(f"管理员删除了 {deleted_count} 个激活码")
             return jsonify({
@@ -140,10 +139,7 @@ def register_activation_routes(app, admin_required):
             filename = f"activation_codes_{current_time}.txt"
 
             # 构建响应
-            text_content = ""
-            for code_data in codes:
-                code, package = code_data
-                text_content += f"{code} - {package}个月\n"
+            text_content = "".join(f"{code} - {package}个月\n" for code, package in codes)
 
             # 创建响应
             response = app.response_class(
@@ -187,13 +187,12 @@ def register_order_admin_routes(app, admin_required):
                 # 普通批量删除
                 order_ids_int = [int(oid) for oid in order_ids]
                 placeholders = ','.join(['%s'] * len(order_ids_int))
-                result = execute_query(
+                deleted_count = execute_query(
                     f"DELETE FROM orders WHERE id IN ({placeholders})",
                     order_ids_int,
                     fetch=False,
-                    return_cursor=True
+                    return_rowcount=True
                 )
-                deleted_count = result.rowcount if result else 0
 
             logger.info(f"管理员 {session.get('username')} 删除了 {deleted_count} 个订单: {order_ids}")
             return jsonify({"success": True, "deleted_count": deleted_count})
@@ -1,15 +1,14 @@
 import logging
 from datetime import datetime, timedelta
 
-import pytz
 from flask import jsonify, request, session
 
 from modules.constants import REASON_TEXT_ZH, STATUS, STATUS_TEXT_ZH, WEB_PRICES
 from modules.web_auth_routes import login_required
 from modules.database import execute_query, refund_order
+from modules.order_balance import CN_TIMEZONE
 
 logger = logging.getLogger(__name__)
-CN_TIMEZONE = pytz.timezone('Asia/Shanghai')
 
 
 def register_order_routes(app, notification_queue):
@@ -277,7 +276,7 @@ def register_order_routes(app, notification_queue):
             accepted_time = datetime.strptime(accepted_at, "%Y-%m-%d %H:%M:%S")
             # 将接单时间转换为aware datetime
             if accepted_time.tzinfo is None:
-                accepted_time = CN_TIMEZONE.localize(accepted_time)
+                accepted_time = accepted_time.replace(tzinfo=CN_TIMEZONE)
             
             # 获取当前中国时间
             now = datetime.now(CN_TIMEZONE)
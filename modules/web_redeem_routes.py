@@ -14,7 +14,7 @@ from modules.database import (
 logger = logging.getLogger(__name__)
 
 
-def register_redeem_routes(app):
+def register_redeem_routes(app, notification_queue):
     @app.route('/redeem', methods=['GET'])
     def redeem_page():
         """激活码兑换页面"""
@@ -254,6 +254,17 @@ def register_redeem_routes(app):
                 # 记录成功日志
                 logger.info(f"用户 {username} 成功兑换激活码 {code}, 套餐: {code_info['package']}, 订单ID: {order_id}")
 
+                # 立即通知卖家，不必等待机器人的兜底轮询
+                if notification_queue is not None:
+                    notification_queue.put({
+                        'type': 'new_order',
+                        'order_id': order_id,
+                        'account': account,
+                        'password': password,
+                        'package': code_info['package']
+                    })
+                    logger.info(f"已将订单 #{order_id} 加入通知队列")
+
                 # 将激活码和订单ID保存到session，以便刷新页面后仍能显示
                 session['last_redeemed_code'] = code
                 session['last_order_id'] = order_id
@@ -34,6 +34,6 @@ def register_routes(app, notification_queue):
 
 
 
-    register_redeem_routes(app)
+    register_redeem_routes(app, notification_queue)
 
     register_activation_routes(app, admin_required)
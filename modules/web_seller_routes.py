@@ -1,5 +1,6 @@
 from flask import jsonify, request, session
 
+from modules.constants import SUPER_ADMIN_ID
 from modules.web_auth_routes import login_required
 from modules.database import (
     get_all_sellers,
@@ -64,7 +65,7 @@ def register_seller_routes(app, admin_required):
             return jsonify({"error": "Missing telegram_id"}), 400
 
         # 不允许修改超级管理员的身份
-        if str(telegram_id) == "1878943383":
+        if str(telegram_id) == str(SUPER_ADMIN_ID):
             return jsonify({"error": "Cannot modify superadmin status"}), 403
 
         if toggle_seller_admin(telegram_id):
@@ -0,0 +1,83 @@
+import sys
+import unittest
+from pathlib import Path
+from unittest import mock
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from modules import cache_utils
+
+
+class TtlCacheTests(unittest.TestCase):
+    def test_caches_until_expiry_and_cache_clear(self):
+        calls = []
+
+        @cache_utils.ttl_cache(60)
+        def lookup(key):
+            calls.append(key)
+            return key * 2
+
+        with mock.patch.object(cache_utils.time, "monotonic", return_value=100.0):
+            self.assertEqual(lookup(1), 2)
+            self.assertEqual(lookup(1), 2)
+        self.assertEqual(calls, [1])
+
+        with mock.patch.object(cache_utils.time, "monotonic", return_value=161.0):
+            lookup(1)
+        self.assertEqual(calls, [1, 1])
+
+        lookup.cache_clear()
+        with mock.patch.object(cache_utils.time, "monotonic", return_value=162.0):
+            lookup(1)
+        self.assertEqual(calls, [1, 1, 1])
+
+    def test_cache_is_bounded_by_maxsize(self):
+        calls = []
+
+        @cache_utils.ttl_cache(60, maxsize=2)
+        def lookup(key):
+            calls.append(key)
+            return key
+
+        for key in (0, 1, 2, 0):
+            lookup(key)
+        self.assertEqual(calls, [0, 1, 2, 0])
+
+class TTLDictTests(unittest.TestCase):
+    def test_entries_expire_and_pop_consumes(self):
+        waiting = cache_utils.TTLDict(ttl=600)
+        with mock.patch.object(cache_utils.time, "monotonic", return_value=100.0):
+            waiting[1] = 55
+            waiting[2] = 66
+            self.assertIn(1, waiting)
+            self.assertEqual(waiting.pop(1), 55)
+            self.assertNotIn(1, waiting)
+
+        with mock.patch.object(cache_utils.time, "monotonic", return_value=701.0):
+            self.assertIsNone(waiting.get(2))
+            self.assertEqual(len(waiting), 0)
+
+    def test_maxsize_evicts_oldest(self):
+        waiting = cache_utils.TTLDict(ttl=600, maxsize=2)
+        for key in range(3):
+            waiting[key] = key
+
+        self.assertNotIn(0, waiting)
+        self.assertEqual(len(waiting), 2)
+
+
+class LRUDictTests(unittest.TestCase):
+    def test_evicts_least_recently_used(self):
+        users = cache_utils.LRUDict(maxsize=2)
+        users[1] = "a"
+        users[2] = "b"
+        self.assertEqual(users[1], "a")
+        users[3] = "c"
+
+        self.assertEqual(list(users), [1, 3])
+
+
+if __name__ == "__main__":
+    unittest.main()
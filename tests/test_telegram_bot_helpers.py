@@ -0,0 +1,584 @@
+import asyncio
+import os
+import queue
+import sys
+import tempfile
+import threading
+import unittest
+from datetime import date, datetime
+from unittest import mock
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from modules import telegram_bot
+
+
+class ReadPhotoBytesTests(unittest.TestCase):
+    def test_reads_current_file_contents_without_caching(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "proof.jpg")
+            Path(path).write_bytes(b"first")
+
+            self.assertEqual(asyncio.run(telegram_bot.read_photo_bytes(path)), b"first")
+
+            Path(path).write_bytes(b"second")
+
+            self.assertEqual(asyncio.run(telegram_bot.read_photo_bytes(path)), b"second")
+
+
+class NotificationBridgeTests(unittest.TestCase):
+    def test_bridge_moves_items_into_asyncio_queue(self):
+        async def run():
+            source = queue.Queue()
+            aio_queue = asyncio.Queue()
+            loop = asyncio.get_running_loop()
+            threading.Thread(
+                target=telegram_bot._bridge_notification_queue,
+                args=(source, loop, aio_queue),
+                daemon=True,
+            ).start()
+            source.put({"type": "new_order", "order_id": 1})
+            return await asyncio.wait_for(aio_queue.get(), timeout=2)
+
+        self.assertEqual(asyncio.run(run()), {"type": "new_order", "order_id": 1})
+
+
+class SellerDispatchStateTests(unittest.TestCase):
+    def test_single_query_splits_mine_and_new(self):
+        rows = [
+            ("M", 9, "a", "p", "1", "accepted", 2),
+            ("M", 7, "b", "q", "3", "failed", 2),
+            ("N", 12, "c", "r", "1", "2024-01-01 00:00:00", None),
+        ]
+        with mock.patch.object(telegram_bot, "execute_query", return_value=rows) as query:
+            count, mine, new = telegram_bot.get_seller_dispatch_state(42)
+
+        self.assertEqual(query.call_count, 1)
+        self.assertEqual(count, 2)
+        self.assertEqual(mine, [row[1:6] for row in rows[:2]])
+        self.assertEqual(new, [rows[2][1:6]])
+
+    def test_no_orders_means_zero_active(self):
+        with mock.patch.object(telegram_bot, "execute_query", return_value=[]):
+            self.assertEqual(telegram_bot.get_seller_dispatch_state(42), (0, [], []))
+
+
+class UserInfoSingleFlightTests(unittest.TestCase):
+    def test_concurrent_lookups_share_one_get_chat(self):
+        app = mock.Mock()
+
+        async def get_chat(user_id):
+            await asyncio.sleep(0)
+            return mock.Mock(username="alice", first_name="Alice", last_name="")
+
+        app.bot.get_chat = mock.AsyncMock(side_effect=get_chat)
+
+        async def run():
+            return await asyncio.gather(*(telegram_bot.get_user_info(55) for _ in range(5)))
+
+        with mock.patch.object(telegram_bot, "bot_application", app), \
+             mock.patch.object(telegram_bot, "user_info_cache", {}):
+            results = asyncio.run(run())
+
+        app.bot.get_chat.assert_awaited_once_with(55)
+        self.assertEqual({info["username"] for info in results}, {"alice"})
+        self.assertEqual(telegram_bot._user_info_inflight, {})
+
+
+class CheckAndPushOrdersTests(unittest.TestCase):
+    ORDERS = [
+        (1, "a@x.com", "pw", "1", "2024-01-01 00:00:00", 10),
+        (2, "b@x.com", "pw", "3", "2024-01-01 00:00:01", 11),
+    ]
+
+    def _run(self, bot, claimed):
+        with mock.patch.object(telegram_bot, "bot_application", bot), \
+             mock.patch.object(telegram_bot, "get_unnotified_orders", return_value=self.ORDERS), \
+             mock.patch.object(telegram_bot, "get_active_seller_ids", return_value=[100, 200]), \
+             mock.patch.object(telegram_bot, "execute_query", return_value=claimed) as query:
+            asyncio.run(telegram_bot.check_and_push_orders())
+        return query
+
+    def test_claims_orders_in_one_update_and_skips_already_claimed(self):
+        bot = mock.Mock()
+        bot.bot.send_message = mock.AsyncMock(return_value=mock.Mock(message_id=5))
+
+        # 订单 2 已被通知队列路径认领
+        query = self._run(bot, [(1,)])
+
+        self.assertEqual(query.call_args_list, [
+            mock.call(telegram_bot.SQL_CLAIM_NOTIFY_MANY, ([1, 2],), fetch=True),
+            mock.call(telegram_bot.SQL_CONFIRM_NOTIFY_MANY, ([1],)),
+        ])
+        self.assertEqual(bot.bot.send_message.await_count, 2)
+        self.assertEqual({call.kwargs["chat_id"] for call in bot.bot.send_message.await_args_list}, {100, 200})
+
+    def test_releases_claim_when_no_seller_received_order(self):
+        bot = mock.Mock()
+        bot.bot.send_message = mock.AsyncMock(side_effect=RuntimeError("blocked"))
+
+        query = self._run(bot, [(1,), (2,)])
+
+        self.assertEqual(query.call_args_list[-1],
+                         mock.call(telegram_bot.SQL_RELEASE_NOTIFY_MANY, ([1, 2],)))
+
+    def test_releases_claims_when_push_is_cancelled(self):
+        calls = []
+
+        def record(*args, **kwargs):
+            calls.append(args)
+            return [(1,), (2,)] if kwargs.get("fetch") else None
+
+        with mock.patch.object(telegram_bot, "bot_application", mock.Mock()), \
+             mock.patch.object(telegram_bot, "get_unnotified_orders", return_value=self.ORDERS), \
+             mock.patch.object(telegram_bot, "get_active_seller_ids", return_value=[100, 200]), \
+             mock.patch.object(telegram_bot, "_broadcast_new_order",
+                               mock.AsyncMock(side_effect=asyncio.CancelledError())), \
+             mock.patch.object(telegram_bot, "execute_query", side_effect=record):
+            with self.assertRaises(asyncio.CancelledError):
+                asyncio.run(telegram_bot.check_and_push_orders())
+
+        self.assertEqual(calls[-1], (telegram_bot.SQL_RELEASE_NOTIFY_MANY, ([1, 2],)))
+
+
+class OrderMarkupTests(unittest.TestCase):
+    def test_markups_are_fresh_dicts_per_call(self):
+        first = telegram_bot.accept_order_markup(7)
+        first["inline_keyboard"][0][0]["text"] = "changed"
+
+        self.assertEqual(telegram_bot.accept_order_markup(7),
+                         {"inline_keyboard": [[{"text": "Accept", "callback_data": "accept_7"}]]})
+
+    def test_dispute_markup_keeps_complete_failed_labels(self):
+        row = telegram_bot.dispute_order_markup(7)["inline_keyboard"][0]
+        self.assertEqual([(b["text"], b["callback_data"]) for b in row],
+                         [("✅ Complete", "done_7"), ("❌ Failed", "fail_7")])
+
+
+DAY = ("2024-01-01 00:00:00", "2024-01-02 00:00:00")
+
+
+class StatsMenuTests(unittest.TestCase):
+    def _update(self, user_id):
+        update = mock.Mock()
+        update.effective_user.id = user_id
+        update.message.reply_text = mock.AsyncMock()
+        return update
+
+    def test_menu_reuses_prebuilt_keyboards(self):
+        with mock.patch.object(telegram_bot, "is_seller", return_value=True):
+            seller = self._update(42)
+            asyncio.run(telegram_bot.on_stats(seller, None))
+            admin = self._update(telegram_bot.SUPER_ADMIN_ID)
+            asyncio.run(telegram_bot.on_stats(admin, None))
+
+        self.assertIs(seller.message.reply_text.await_args.kwargs["reply_markup"],
+                      telegram_bot.STATS_KEYBOARD_PERSONAL)
+        self.assertIs(admin.message.reply_text.await_args.kwargs["reply_markup"],
+                      telegram_bot.STATS_KEYBOARD_ALL)
+        self.assertEqual(telegram_bot.STATS_KEYBOARD_ALL.inline_keyboard[-1][0].callback_data,
+                         "stats_all_sellers_menu")
+
+
+class PeriodStatsTests(unittest.TestCase):
+    def test_grouped_rows_build_daily_and_summary_lines(self):
+        query = mock.Mock()
+        query.edit_message_text = mock.AsyncMock()
+        rows = [("2024-01-01", "1", 2), ("2024-01-01", "3", 1), ("2024-01-02", "1", 1)]
+
+        with mock.patch.object(telegram_bot, "execute_query", return_value=rows) as execute:
+            asyncio.run(telegram_bot.show_period_stats(
+                query, 42, date(2024, 1, 1), date(2024, 1, 2), "This Week"))
+
+        self.assertIn("GROUP BY", execute.call_args.args[0])
+        self.assertEqual(execute.call_args.args[1][2:], ("2024-01-01 00:00:00", "2024-01-03 00:00:00"))
+        message = query.edit_message_text.await_args.args[0]
+        self.assertIn("📅 2024-01-01: 3 orders, $8.10", message)
+        self.assertIn("📅 2024-01-02: 1 orders, $1.65", message)
+        self.assertIn("1 Month: 3 x $1.65 = $4.95", message)
+        self.assertIn("Total Orders: 4", message)
+
+    def test_long_period_keeps_summary_when_truncated(self):
+        query = mock.Mock()
+        query.edit_message_text = mock.AsyncMock()
+        rows = [(f"2024-01-{day:02d}", package, 1)
+                for day in range(1, 32) for package in ("1", "2", "3", "6", "12")]
+
+        with mock.patch.object(telegram_bot, "execute_query", return_value=rows):
+            asyncio.run(telegram_bot.show_period_stats(
+                query, 42, date(2024, 1, 1), date(2024, 1, 31), "This Month"))
+
+        message = query.edit_message_text.await_args.args[0]
+        self.assertLessEqual(len(message), telegram_bot._STATS_MESSAGE_LIMIT)
+        self.assertIn(telegram_bot._STATS_TRUNCATED_NOTE, message)
+        self.assertIn("📅 2024-01-01:", message)
+        self.assertTrue(message.endswith("Total Earnings: $1026.10"))
+
+
+class DateRangeTests(unittest.TestCase):
+    def test_periods_are_half_open_and_include_today(self):
+        today = date(2024, 3, 6)  # 周三
+        self.assertEqual(telegram_bot.date_range("today", today),
+                         ("2024-03-06 00:00:00", "2024-03-07 00:00:00"))
+        self.assertEqual(telegram_bot.date_range("yesterday", today),
+                         ("2024-03-05 00:00:00", "2024-03-06 00:00:00"))
+        self.assertEqual(telegram_bot.date_range("week", today),
+                         ("2024-03-04 00:00:00", "2024-03-07 00:00:00"))
+        self.assertEqual(telegram_bot.date_range("month", today),
+                         ("2024-03-01 00:00:00", "2024-03-07 00:00:00"))
+
+    def test_single_day_range_crosses_month_end(self):
+        self.assertEqual(telegram_bot.date_range("today", date(2024, 2, 29)),
+                         ("2024-02-29 00:00:00", "2024-03-01 00:00:00"))
+        self.assertEqual(telegram_bot.date_range("yesterday", date(2024, 3, 1)),
+                         ("2024-02-29 00:00:00", "2024-03-01 00:00:00"))
+
+    def test_personal_yesterday_uses_date_range(self):
+        query = mock.Mock()
+        query.data = "stats_yesterday_personal"
+        query.from_user.id = 42
+        query.answer = mock.AsyncMock()
+        update = mock.Mock()
+        update.callback_query = query
+        show = mock.AsyncMock()
+
+        with mock.patch.object(telegram_bot, "is_seller", return_value=True), \
+             mock.patch.object(telegram_bot, "show_personal_stats", show):
+            asyncio.run(telegram_bot.on_stats_callback(update, None))
+
+        today = datetime.now(telegram_bot.CN_TIMEZONE).date()
+        self.assertEqual(show.await_args.args[2], telegram_bot.date_range("yesterday", today))
+        self.assertEqual(show.await_args.args[3], "Yesterday")
+
+    def test_all_sellers_week_uses_full_range(self):
+        query = mock.Mock()
+        query.data = "stats_all_sellers_week"
+        query.from_user.id = telegram_bot.SUPER_ADMIN_ID
+        query.answer = mock.AsyncMock()
+        update = mock.Mock()
+        update.callback_query = query
+        show = mock.AsyncMock()
+
+        with mock.patch.object(telegram_bot, "is_seller", return_value=True), \
+             mock.patch.object(telegram_bot, "show_all_stats", show):
+            asyncio.run(telegram_bot.on_stats_callback(update, None))
+
+        bounds = show.await_args.args[1]
+        self.assertEqual(bounds[1], telegram_bot.date_range("today", datetime.now(telegram_bot.CN_TIMEZONE).date())[1])
+        self.assertEqual(show.await_args.args[2], "This Week")
+
+
+class AllStatsCacheTests(unittest.TestCase):
+    def test_repeated_refresh_reuses_rendered_message(self):
+        query = mock.Mock()
+        query.from_user.id = telegram_bot.SUPER_ADMIN_ID
+        query.edit_message_text = mock.AsyncMock()
+        build = mock.AsyncMock(return_value="stats")
+
+        async def run():
+            telegram_bot._all_stats_cache.clear()
+            with mock.patch.object(telegram_bot, "build_all_stats_message", build):
+                await telegram_bot.show_all_stats(query, DAY, "2024-01-01")
+                await telegram_bot.show_all_stats(query, DAY, "2024-01-01")
+
+        asyncio.run(run())
+
+        build.assert_awaited_once_with(DAY, "2024-01-01")
+        self.assertEqual(query.edit_message_text.await_count, 2)
+
+    def test_different_periods_rebuild_concurrently(self):
+        query = mock.Mock()
+        query.from_user.id = telegram_bot.SUPER_ADMIN_ID
+        query.edit_message_text = mock.AsyncMock()
+        other_day = ("2024-01-02 00:00:00", "2024-01-03 00:00:00")
+        building = []
+
+        async def build(bounds, period_text):
+            building.append(bounds)
+            if bounds == DAY:
+                # 慢查询：等到另一个时间段也开始重建才返回
+                while other_day not in building:
+                    await asyncio.sleep(0)
+            return period_text
+
+        async def run():
+            telegram_bot._all_stats_cache.clear()
+            with mock.patch.object(telegram_bot, "build_all_stats_message", side_effect=build):
+                await asyncio.wait_for(asyncio.gather(
+                    telegram_bot.show_all_stats(query, DAY, "2024-01-01"),
+                    telegram_bot.show_all_stats(query, other_day, "2024-01-02"),
+                ), timeout=1)
+
+        asyncio.run(run())
+
+        self.assertEqual(building, [DAY, other_day])
+        self.assertEqual(telegram_bot._all_stats_locks, {})
+
+
+class PersonalStatsTests(unittest.TestCase):
+    def _query(self):
+        query = mock.Mock()
+        query.edit_message_text = mock.AsyncMock()
+        return query
+
+    def test_repeated_clicks_hit_cache_until_invalidated(self):
+        query = self._query()
+        telegram_bot.invalidate_stats_caches()
+        with mock.patch.object(telegram_bot, "execute_query", return_value=[("1", 2)]) as execute:
+            asyncio.run(telegram_bot.show_personal_stats(query, 42, DAY, "Today"))
+            asyncio.run(telegram_bot.show_personal_stats(query, 42, DAY, "Today"))
+            self.assertEqual(execute.call_count, 1)
+
+            telegram_bot.invalidate_stats_caches()
+            asyncio.run(telegram_bot.show_personal_stats(query, 42, DAY, "Today"))
+            self.assertEqual(execute.call_count, 2)
+
+        self.assertIn("1 Month: 2 x $1.65 = $3.30", query.edit_message_text.await_args.args[0])
+
+    def test_unknown_package_does_not_break_message(self):
+        query = self._query()
+        telegram_bot.invalidate_stats_caches()
+        with mock.patch.object(telegram_bot, "execute_query", return_value=[("1", 1), ("legacy", 2)]):
+            asyncio.run(telegram_bot.show_personal_stats(query, 7, DAY, "Today"))
+
+        message = query.edit_message_text.await_args.args[0]
+        self.assertIn("legacy: 2 x $0.00 = $0.00", message)
+        self.assertIn("Total Orders: 3", message)
+
+
+class AllStatsMessageTests(unittest.TestCase):
+    def test_uses_seller_table_names_and_only_looks_up_missing_ones(self):
+        rows = [
+            ("100", "1", 2, "alice"),
+            ("100", "3", 1, "alice"),
+            ("200", "1", 1, None),
+        ]
+        lookup = mock.AsyncMock(return_value={"username": "bob", "first_name": "Bob"})
+
+        with mock.patch.object(telegram_bot, "execute_query", return_value=rows), \
+             mock.patch.object(telegram_bot, "get_user_info", lookup):
+            message = asyncio.run(telegram_bot.build_all_stats_message(DAY, "Today"))
+
+        lookup.assert_awaited_once_with(200)
+        self.assertIn("👤 @alice: 3 orders", message)
+        self.assertIn("👤 @bob: 1 orders", message)
+        self.assertIn("Total Staff: 2", message)
+
+
+class WebhookEnqueueTests(unittest.TestCase):
+    def test_update_is_handed_to_application_queue_without_blocking(self):
+        async def run():
+            app = mock.Mock()
+            app.update_queue = asyncio.Queue()
+            loop = asyncio.get_running_loop()
+            with mock.patch.object(telegram_bot, "bot_application", app), \
+                 mock.patch.object(telegram_bot, "BOT_LOOP", loop):
+                await loop.run_in_executor(
+                    None, telegram_bot.process_telegram_update, {"update_id": 7}, None
+                )
+                return await asyncio.wait_for(app.update_queue.get(), timeout=2)
+
+        self.assertEqual(asyncio.run(run()).update_id, 7)
+
+
+class BotShutdownTests(unittest.TestCase):
+    def test_stop_bot_lets_bot_thread_finish_teardown(self):
+        torn_down = threading.Event()
+
+        async def fake_main(notification_queue):
+            try:
+                await telegram_bot._shutdown_event.wait()
+            finally:
+                torn_down.set()
+
+        with mock.patch.object(telegram_bot, "bot_main", fake_main), \
+             mock.patch.object(telegram_bot, "BOT_LOOP", None), \
+             mock.patch.object(telegram_bot, "_shutdown_event", None):
+            thread = threading.Thread(target=telegram_bot.run_bot, args=(queue.Queue(),), daemon=True)
+            thread.start()
+            for _ in range(200):
+                if telegram_bot.BOT_LOOP is not None and telegram_bot.BOT_LOOP.is_running():
+                    break
+                threading.Event().wait(0.01)
+
+            telegram_bot.stop_bot()
+            thread.join(timeout=2)
+
+        self.assertFalse(thread.is_alive())
+        self.assertTrue(torn_down.is_set())
+
+
+class SellerCommandTests(unittest.TestCase):
+    def test_status_and_header_share_one_message(self):
+        update = mock.Mock()
+        update.effective_user.id = 42
+        update.message.reply_text = mock.AsyncMock()
+        new_orders = [(2, "b@x.com", "pw", "1", "t2"), (1, "a@x.com", "pw", "3", "t1")]
+        my_orders = [(9, "c@x.com", "pw", "1", "accepted"), (8, "d@x.com", "pw", "1", "failed")]
+
+        with mock.patch.object(telegram_bot, "is_seller", return_value=True), \
+             mock.patch.object(telegram_bot, "get_seller_dispatch_state", return_value=(1, my_orders, new_orders)):
+            asyncio.run(telegram_bot.on_admin_command(update, None))
+
+        texts = [call.args[0] for call in update.message.reply_text.await_args_list]
+        self.assertIn("1/3 active orders", texts[0])
+        self.assertIn("Available Orders", texts[0])
+        self.assertEqual(len(texts), 5)
+        markup = update.message.reply_text.await_args_list[-1].kwargs["reply_markup"]
+        self.assertEqual([button.text for button in markup.inline_keyboard[0]], ["✅ Mark Complete", "❌ Mark Failed"])
+
+    def test_order_cards_arrive_newest_first(self):
+        update = mock.Mock()
+        update.effective_user.id = 42
+        started, sent = [], []
+
+        async def reply_text(text, **kwargs):
+            # 先发出的消息更晚完成，并发发送时顺序会被打乱
+            started.append(text)
+            await asyncio.sleep(0.01 * (5 - len(started)))
+            sent.append(text)
+
+        update.message.reply_text = reply_text
+        new_orders = [(3, "c@x.com", "pw", "1", "t3"), (2, "b@x.com", "pw", "1", "t2"), (1, "a@x.com", "pw", "1", "t1")]
+
+        with mock.patch.object(telegram_bot, "is_seller", return_value=True), \
+             mock.patch.object(telegram_bot, "get_seller_dispatch_state", return_value=(0, [], new_orders)):
+            asyncio.run(telegram_bot.on_admin_command(update, None))
+
+        self.assertEqual([text.split("*")[1] for text in sent[1:]], ["Order #3", "Order #2", "Order #1"])
+
+
+class FeedbackButtonTests(unittest.TestCase):
+    def _query(self, data):
+        query = mock.Mock()
+        query.from_user.id = 42
+        query.data = data
+
+        # 与 Telegram 一致：同一回调第二次 answer 会被拒绝
+        async def answer(*args, **kwargs):
+            if query.answer.await_count > 1:
+                raise RuntimeError("Query is too old or already answered")
+
+        query.answer = mock.AsyncMock(side_effect=answer)
+        query.edit_message_reply_markup = mock.AsyncMock()
+        update = mock.Mock()
+        update.callback_query = query
+        return update, query
+
+    def test_fail_on_order_not_owned_skips_refund_and_ui(self):
+        update, query = self._query("reason_wrong_password_7")
+        with mock.patch.object(telegram_bot, "is_seller", return_value=True), \
+             mock.patch.object(telegram_bot, "execute_query", return_value=[]), \
+             mock.patch("modules.database.refund_order") as refund:
+            asyncio.run(telegram_bot.on_feedback_button(update, None))
+
+        refund.assert_not_called()
+        query.edit_message_reply_markup.assert_not_awaited()
+        self.assertTrue(query.answer.await_args_list[-1].kwargs.get("show_alert"))
+
+    def test_database_update_runs_off_the_event_loop_thread(self):
+        update, query = self._query("done_7")
+        threads = []
+
+        def execute(*args, **kwargs):
+            threads.append(threading.current_thread())
+            return [(7,)]
+
+        with mock.patch.object(telegram_bot, "is_seller", return_value=True), \
+             mock.patch.object(telegram_bot, "execute_query", side_effect=execute):
+            asyncio.run(telegram_bot.on_feedback_button(update, None))
+
+        self.assertEqual(len(threads), 1)
+        self.assertIsNot(threads[0], threading.current_thread())
+
+    def test_done_on_order_not_owned_answers_once_with_alert(self):
+        update, query = self._query("done_7")
+        with mock.patch.object(telegram_bot, "is_seller", return_value=True), \
+             mock.patch.object(telegram_bot, "execute_query", return_value=[]):
+            asyncio.run(telegram_bot.on_feedback_button(update, None))
+
+        query.answer.assert_awaited_once_with(telegram_bot._ORDER_NOT_ACTIONABLE, show_alert=True)
+        query.edit_message_reply_markup.assert_not_awaited()
+
+    def test_each_branch_answers_exactly_once(self):
+        for data, rows in (("done_7", [(7,)]), ("fail_7", None), ("reason_cancel_7", None),
+                           ("reason_wrong_password_7", [(7,)])):
+            with self.subTest(data=data):
+                update, query = self._query(data)
+                with mock.patch.object(telegram_bot, "is_seller", return_value=True), \
+                     mock.patch.object(telegram_bot, "execute_query", return_value=rows), \
+                     mock.patch("modules.database.refund_order", return_value=(True, 0)):
+                    asyncio.run(telegram_bot.on_feedback_button(update, None))
+                self.assertEqual(query.answer.await_count, 1)
+
+    def test_done_updates_ui_when_row_returned(self):
+        update, query = self._query("done_7")
+        with mock.patch.object(telegram_bot, "is_seller", return_value=True), \
+             mock.patch.object(telegram_bot, "execute_query", return_value=[(7,)]):
+            asyncio.run(telegram_bot.on_feedback_button(update, None))
+
+        query.edit_message_reply_markup.assert_awaited_once()
+        self.assertIs(query.edit_message_reply_markup.await_args.kwargs["reply_markup"],
+                      telegram_bot._noop_markup("✅ Completed"))
+
+    def test_fail_reason_menu_targets_the_order(self):
+        update, query = self._query("fail_7")
+        with mock.patch.object(telegram_bot, "is_seller", return_value=True):
+            asyncio.run(telegram_bot.on_feedback_button(update, None))
+
+        markup = query.edit_message_reply_markup.await_args.kwargs["reply_markup"]
+        self.assertEqual(markup, telegram_bot._fail_reasons_markup(7))
+        self.assertEqual(markup.inline_keyboard[0][0].callback_data, "reason_wrong_password_7")
+
+    def test_reason_cancel_restores_original_buttons(self):
+        update, query = self._query("reason_cancel_7")
+        with mock.patch.object(telegram_bot, "is_seller", return_value=True):
+            asyncio.run(telegram_bot.on_feedback_button(update, None))
+
+        markup = query.edit_message_reply_markup.await_args.kwargs["reply_markup"]
+        self.assertEqual([button.text for button in markup.inline_keyboard[0]], ["✅ Complete", "❌ Failed"])
+
+
+class RechargeCallbackTests(unittest.TestCase):
+    def test_approve_runs_off_the_event_loop_thread(self):
+        query = mock.Mock()
+        query.data = "approve_recharge:12"
+        query.answer = mock.AsyncMock()
+        query.edit_message_reply_markup = mock.AsyncMock()
+        update = mock.Mock()
+        update.callback_query = query
+        update.effective_user.id = telegram_bot.SUPER_ADMIN_ID
+        threads = []
+
+        def approve(request_id, admin_id):
+            threads.append(threading.current_thread())
+            return True, "ok"
+
+        with mock.patch.object(telegram_bot, "approve_recharge_request", side_effect=approve) as approve_mock:
+            asyncio.run(telegram_bot.on_approve_recharge(update, None))
+
+        approve_mock.assert_called_once_with(12, str(telegram_bot.SUPER_ADMIN_ID))
+        self.assertIsNot(threads[0], threading.current_thread())
+        query.edit_message_reply_markup.assert_awaited_once()
+
+
+class IsSellerTests(unittest.TestCase):
+    def test_seller_lookup_runs_off_the_event_loop_thread(self):
+        threads = []
+
+        def seller_ids():
+            threads.append(threading.current_thread())
+            return {42}
+
+        with mock.patch.object(telegram_bot, "get_active_seller_id_set", side_effect=seller_ids):
+            self.assertTrue(asyncio.run(telegram_bot.is_seller(42)))
+            self.assertFalse(asyncio.run(telegram_bot.is_seller(7)))
+
+        self.assertNotIn(threading.current_thread(), threads)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -238,7 +238,7 @@ class WebRouteStructureTests(unittest.TestCase):
         app = Flask(__name__)
         app.secret_key = "test-secret"
 
-        register_redeem_routes(app)
+        register_redeem_routes(app, notification_queue=None)
 
         routes = {rule.endpoint: (rule.rule, rule.methods) for rule in app.url_map.iter_rules()}
         self.assertEqual(routes["redeem_page"][0], "/redeem")
@@ -252,7 +252,7 @@ class WebRouteStructureTests(unittest.TestCase):
 
     def test_web_routes_delegates_redeem_route_registration(self):
         source = (PROJECT_ROOT / "modules" / "web_routes.py").read_text()
-        self.assertIn("register_redeem_routes(app)", source)
+        self.assertIn("register_redeem_routes(app, notification_queue)", source)
         self.assertNotIn("@app.route('/redeem', methods=['GET'])", source)
         self.assertNotIn("@app.route('/redeem/<code>'", source)
         self.assertNotIn("@app.route('/api/verify-code'", source)
@@ -415,7 +415,7 @@ class WebRouteStructureTests(unittest.TestCase):
                 "register_order_admin_routes(app, admin_required)",
                 "register_seller_routes(app, admin_required)",
                 "register_recharge_routes(app, notification_queue, admin_required)",
-                "register_redeem_routes(app)",
+                "register_redeem_routes(app, notification_queue)",
                 "register_activation_routes(app, admin_required)",
             ],
         )